@@ -1,12 +1,13 @@
 """Built-in shell commands."""
 
 import os
-import readline
 import shutil
 import sys
 from collections.abc import Callable
 from typing import TYPE_CHECKING
 
+from simpleshell.expansion import invalidate_glob_cache
+
 if TYPE_CHECKING:
     from simpleshell.shell import Shell
 
@@ -30,9 +31,34 @@ BUILTINS_HELP: dict[str, str] = {
 }
 
 
+# Command name -> full path, for commands found on the current PATH
+_which_hits: dict[str, str] = {}
+
+
+def invalidate_path_cache() -> None:
+    """Clear cached command lookups (call after PATH changes)."""
+    _which_hits.clear()
+
+
+def which_cached(name: str) -> str | None:
+    """Return the full path of a command, like shutil.which (cached).
+
+    Only hits are cached: a miss is looked up again next time, so a command
+    installed mid-session is found at once. Names with a slash resolve
+    against the cwd and are never cached.
+    """
+    if "/" in name:
+        return shutil.which(name)
+    path = _which_hits.get(name)
+    if path is None:
+        path = shutil.which(name)
+        if path is not None:
+            _which_hits[name] = path
+    return path
+
+
 def builtin_cd(args: list[str], shell: "Shell") -> int:
-    target = args[0] if args else os.path.expanduser("~")
-    target = os.path.expanduser(target)
+    target = os.path.expanduser(args[0]) if args else shell._home
     try:
         os.chdir(target)
     except FileNotFoundError:
@@ -41,12 +67,13 @@ def builtin_cd(args: list[str], shell: "Shell") -> int:
     except NotADirectoryError:
         print(f"cd: not a directory: {target}", file=sys.stderr)
         return 1
+    invalidate_glob_cache()
     return 0
 
 
 def builtin_exit(args: list[str], shell: "Shell") -> int:
     code = int(args[0]) if args else 0
-    shell.save_history()
+    # History is saved by the atexit hook registered in Shell.run
     sys.exit(code)
 
 
@@ -65,30 +92,33 @@ def builtin_pwd(args: list[str], shell: "Shell") -> int:
 
 def builtin_export(args: list[str], shell: "Shell") -> int:
     if not args:
-        for key, value in sorted(os.environ.items()):
-            print(f"export {key}={value!r}")
+        sys.stdout.write(
+            "".join(f"export {key}={value!r}\n" for key, value in sorted(os.environ.items()))
+        )
         return 0
     for arg in args:
         if "=" in arg:
             name, _, value = arg.partition("=")
             os.environ[name] = value
             if name == "PATH":
-                # Invalidate cached PATH commands for tab completion
-                from simpleshell.completion import invalidate_path_cache
-
                 invalidate_path_cache()
+            elif name == "HOME":
+                shell.refresh_home()
     return 0
 
 
 def builtin_unset(args: list[str], shell: "Shell") -> int:
     for name in args:
         os.environ.pop(name, None)
+        if name == "PATH":
+            invalidate_path_cache()
+        elif name == "HOME":
+            shell.refresh_home()
     return 0
 
 
 def builtin_env(args: list[str], shell: "Shell") -> int:
-    for key, value in sorted(os.environ.items()):
-        print(f"{key}={value}")
+    sys.stdout.write("".join(f"{key}={value}\n" for key, value in sorted(os.environ.items())))
     return 0
 
 
@@ -100,7 +130,7 @@ def builtin_alias(args: list[str], shell: "Shell") -> int:
     for arg in args:
         if "=" in arg:
             name, _, value = arg.partition("=")
-            shell.aliases[name] = value
+            shell.set_alias(name, value)
         else:
             if arg in shell.aliases:
                 print(f"alias {arg}={shell.aliases[arg]!r}")
@@ -113,7 +143,7 @@ def builtin_alias(args: list[str], shell: "Shell") -> int:
 def builtin_unalias(args: list[str], shell: "Shell") -> int:
     for name in args:
         if name in shell.aliases:
-            del shell.aliases[name]
+            shell.unset_alias(name)
         else:
             print(f"unalias: {name}: not found", file=sys.stderr)
             return 1
@@ -121,6 +151,8 @@ def builtin_unalias(args: list[str], shell: "Shell") -> int:
 
 
 def builtin_history(args: list[str], shell: "Shell") -> int:
+    import readline
+
     length = readline.get_current_history_length()
     for i in range(1, length + 1):
         print(f"  {i}  {readline.get_history_item(i)}")
@@ -130,7 +162,7 @@ def builtin_history(args: list[str], shell: "Shell") -> int:
 def builtin_which(args: list[str], shell: "Shell") -> int:
     ret = 0
     for name in args:
-        path = shutil.which(name)
+        path = which_cached(name)
         if path:
             print(path)
         else:
@@ -153,7 +185,7 @@ def builtin_type(args: list[str], shell: "Shell") -> int:
             case n if n in shell.aliases:
                 print(f"{name} is aliased to `{shell.aliases[n]}'")
             case _:
-                path = shutil.which(name)
+                path = which_cached(name)
                 if path:
                     print(f"{name} is {path}")
                 else:
@@ -167,14 +199,21 @@ def builtin_source(args: list[str], shell: "Shell") -> int:
         print("source: filename argument required", file=sys.stderr)
         return 1
     try:
-        with open(args[0]) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    shell.run_command(line)
+        with open(args[0], "rb") as f:
+            data = f.read()
     except FileNotFoundError:
         print(f"source: {args[0]}: No such file or directory", file=sys.stderr)
         return 1
+    # Decode once for the whole file; invalid UTF-8 must not abort the shell
+    lines = data.decode("utf-8", "replace").splitlines()
+    shell._scripted += 1
+    try:
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                shell.run_command(line)
+    finally:
+        shell._scripted -= 1
     return 0
 
 
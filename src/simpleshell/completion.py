@@ -1,13 +1,26 @@
 """Readline tab completion for files, directories, and commands."""
 
+import bisect
+import heapq
 import os
 import readline
-from functools import lru_cache
+import stat
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 from simpleshell.builtins import BUILTIN_REGISTRY
+from simpleshell.expansion import SETTLE_NS
 
 _matches: list[str] = []
 
+_BUILTIN_NAMES_SORTED = tuple(sorted(BUILTIN_REGISTRY))
+
+# PATH directory -> (mtime_ns when scanned, executable names in it)
+_path_dir_cache: dict[str, tuple[int, frozenset[str]]] = {}
+# ((directory, mtime_ns) pairs, merged sorted names) from the last full lookup
+_path_commands: tuple[tuple[tuple[str, int | None], ...], tuple[str, ...]] | None = None
+
 
 def setup_completion() -> None:
     """Configure readline for tab completion."""
@@ -16,11 +29,6 @@ def setup_completion() -> None:
     readline.parse_and_bind("tab: complete")
 
 
-def invalidate_path_cache() -> None:
-    """Clear the cached PATH commands (call after PATH changes)."""
-    _get_path_commands.cache_clear()
-
-
 def completer(text: str, state: int) -> str | None:
     """Readline completer function.
 
@@ -46,19 +54,29 @@ def completer(text: str, state: int) -> str | None:
 
 def _complete_command(text: str) -> list[str]:
     """Complete a command name from builtins and PATH executables."""
-    matches: list[str] = []
+    # Each source is already sorted, so a linear merge keeps the result ordered
+    merged = heapq.merge(
+        _prefix_range(_BUILTIN_NAMES_SORTED, text),
+        _prefix_range(_get_path_commands(), text),
+        _complete_path(text),
+    )
+    return list(_unique(merged))
 
-    for name in BUILTIN_REGISTRY:
-        if name.startswith(text):
-            matches.append(name)
 
-    for cmd in _get_path_commands():
-        if cmd.startswith(text):
-            matches.append(cmd)
+def _unique(items: Iterable[str]) -> Iterator[str]:
+    """Drop adjacent duplicates from a sorted stream."""
+    prev = None
+    for item in items:
+        if item != prev:
+            yield item
+            prev = item
 
-    matches.extend(_complete_path(text))
 
-    return sorted(set(matches))
+def _prefix_range(names: tuple[str, ...], text: str) -> tuple[str, ...]:
+    """Return the slice of a sorted tuple whose entries start with text."""
+    lo = bisect.bisect_left(names, text)
+    hi = bisect.bisect_left(names, text + "\U0010ffff", lo)
+    return names[lo:hi]
 
 
 def _complete_path(text: str) -> list[str]:
@@ -72,33 +90,86 @@ def _complete_path(text: str) -> list[str]:
         basename = ""
         dirname = ""
 
+    prefix = os.path.join(dirname, "") if dirname else ""
     matches: list[str] = []
     try:
-        for entry in os.listdir(search_dir):
-            if entry.startswith(basename):
-                full = os.path.join(dirname, entry) if dirname else entry
-                if os.path.isdir(os.path.join(search_dir, entry)):
-                    full += "/"
-                matches.append(full)
+        with os.scandir(search_dir) as it:
+            for entry in it:
+                if entry.name.startswith(basename):
+                    # is_dir() uses the d_type from readdir; only symlinks need a stat
+                    suffix = "/" if entry.is_dir() else ""
+                    matches.append(prefix + entry.name + suffix)
     except OSError:
         pass
 
-    return sorted(matches)
+    matches.sort()
+    return matches
 
 
-@lru_cache(maxsize=1)
-def _get_path_commands() -> frozenset[str]:
-    """Get all executable command names from PATH (cached)."""
-    commands: set[str] = set()
-    path = os.environ.get("PATH", "")
+def _get_path_commands() -> tuple[str, ...]:
+    """Get all executable command names from PATH, sorted (cached).
 
-    for directory in path.split(os.pathsep):
-        try:
-            for entry in os.listdir(directory):
-                full_path = os.path.join(directory, entry)
-                if os.access(full_path, os.X_OK):
-                    commands.add(entry)
-        except OSError:
+    Each directory's names are cached against its mtime, so only directories
+    that changed since the last call are rescanned. Those are scanned
+    concurrently, which hides the latency of slow (network or FUSE) mounts.
+    """
+    global _path_commands
+    directories = list(dict.fromkeys(os.environ.get("PATH", "").split(os.pathsep)))
+    key = tuple((directory, _dir_mtime(directory)) for directory in directories)
+    if _path_commands is not None and _path_commands[0] == key:
+        return _path_commands[1]
+
+    # Directories that have not settled (see SETTLE_NS) are rescanned every time
+    settled = time.time_ns() - SETTLE_NS
+    unsettled = False
+    stale: list[tuple[str, int]] = []
+    for directory, mtime_ns in key:
+        if mtime_ns is None:
             continue
+        if mtime_ns > settled:
+            unsettled = True
+        cached = _path_dir_cache.get(directory)
+        if cached is None or cached[0] != mtime_ns or mtime_ns > settled:
+            stale.append((directory, mtime_ns))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            scanned = pool.map(_scan_path_dir, [directory for directory, _ in stale])
+            for (directory, mtime_ns), names in zip(stale, scanned, strict=True):
+                _path_dir_cache[directory] = (mtime_ns, frozenset(names))
+
+    commands = frozenset().union(
+        *(_path_dir_cache[directory][1] for directory, mtime_ns in key if mtime_ns is not None)
+    )
+    result = tuple(sorted(commands))
+    _path_commands = None if unsettled else (key, result)
+    return result
+
+
+def _dir_mtime(directory: str) -> int | None:
+    """Return a directory's mtime in nanoseconds, or None if it cannot be read."""
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
 
-    return frozenset(commands)
+def _scan_path_dir(directory: str) -> list[str]:
+    """Return the names of executable regular files in one directory."""
+    names: list[str] = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                # d_type from the directory listing rules out subdirectories,
+                # sockets etc. without a stat; only files and symlinks need one
+                if not (entry.is_file(follow_symlinks=False) or entry.is_symlink()):
+                    continue
+                try:
+                    mode = entry.stat().st_mode
+                except OSError:
+                    continue
+                if stat.S_ISREG(mode) and mode & 0o111:
+                    names.append(entry.name)
+    except OSError:
+        pass
+    return names
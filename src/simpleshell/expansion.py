@@ -1,10 +1,40 @@
 """Variable expansion and glob expansion."""
 
+import fnmatch
 import glob as globmod
 import os
 import re
-
-from simpleshell.tokenizer import OPERATORS
+import time
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Final
+
+# Characters that make a token a glob pattern
+_MAGIC: Final = frozenset("*?[")
+
+# Timestamps are coarse, so a directory touched within the last second may
+# change again without its mtime moving; listings are only cached once settled.
+SETTLE_NS: Final = 1_000_000_000
+
+# One pass over the line: escapes and single-quoted runs are kept verbatim,
+# double-quoted runs are expanded inside, bare $VAR / ${VAR} are expanded.
+_VAR_RE: Final = re.compile(
+    r"""
+      \\.                                   # backslash escape
+    | '[^']*'                               # single-quoted run
+    | (?P<dquoted>"(?:\\.|[^"\\])*")        # double-quoted run
+    | \$\{(?P<braced>[^}]*)\}               # ${VAR}
+    | \$(?P<name>[A-Za-z_][A-Za-z0-9_]*)    # $VAR
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+# Inside double quotes only escapes and variables are significant. This is
+# also all that matters in a line with no quotes at all.
+_DQUOTE_VAR_RE: Final = re.compile(
+    r"\\.|\$\{(?P<braced>[^}]*)\}|\$(?P<name>[A-Za-z_][A-Za-z0-9_]*)",
+    re.DOTALL,
+)
 
 
 def expand_variables(line: str) -> str:
@@ -14,92 +44,146 @@ def expand_variables(line: str) -> str:
     Variables in double quotes and unquoted contexts ARE expanded.
     Undefined variables expand to empty string.
     """
-    result: list[str] = []
-    i = 0
-    quote: str | None = None  # None, "'", or '"'
-
-    while i < len(line):
-        ch = line[i]
-
-        # Handle backslash escape
-        if ch == "\\" and i + 1 < len(line):
-            result.append(ch)
-            result.append(line[i + 1])
-            i += 2
-            continue
+    if "$" not in line:
+        return line
+    if "'" not in line and '"' not in line:
+        return _DQUOTE_VAR_RE.sub(_substitute, line)
+    return _VAR_RE.sub(_substitute, line)
+
+
+def _substitute(match: re.Match[str]) -> str:
+    """Replacement callback for _VAR_RE and _DQUOTE_VAR_RE.
+
+    Dispatches on the name of the group that matched, so no per-match
+    group dictionary is built.
+    """
+    kind = match.lastgroup
+    if kind is None:
+        return match.group(0)
+    if kind == "dquoted":
+        return _DQUOTE_VAR_RE.sub(_substitute, match.group(0))
+    return os.environ.get(match.group(kind), "")
 
-        # Track quote state
-        if ch in ("'", '"'):
-            if quote is None:
-                quote = ch
-            elif quote == ch:
-                quote = None
-            result.append(ch)
-            i += 1
-            continue
 
-        # Expand $ only outside single quotes
-        if ch == "$" and quote != "'":
-            expanded, consumed = _expand_one_var(line, i)
-            result.append(expanded)
-            i += consumed
+def expand_globs(tokens: list[str]) -> list[str]:
+    """Expand glob patterns (*, ? and [...]) in tokens.
+
+    Tokens that match no files are left unchanged.
+    Operator tokens are never glob-expanded.
+    """
+    expanded: list[str] = []
+    for token in tokens:
+        # Most tokens have no magic characters; test that first. Operators
+        # never do, so they always take this branch.
+        if _MAGIC.isdisjoint(token):
+            expanded.append(token)
             continue
+        matches = _glob(token)
+        if matches:
+            expanded.extend(matches)
+        else:
+            expanded.append(token)
+    return expanded
 
-        result.append(ch)
-        i += 1
 
-    return "".join(result)
+def invalidate_glob_cache() -> None:
+    """Clear the cached glob results (call after changing directory)."""
+    _glob_cached.cache_clear()
 
 
-def _expand_one_var(line: str, pos: int) -> tuple[str, int]:
-    """Expand a single variable starting at line[pos] == '$'.
+def _glob(pattern: str) -> list[str]:
+    """Return the sorted matches for a glob pattern.
 
-    Returns (expanded_value, characters_consumed).
-    Handles $VAR and ${VAR} forms.
+    Patterns whose directory part is literal are matched against a single
+    directory listing and cached, keyed on the directory's mtime so that
+    creating or removing entries invalidates them. Anything else goes
+    through the glob module.
     """
-    if pos + 1 >= len(line):
-        return ("$", 1)
+    dirname, basename = os.path.split(pattern)
+    if not _MAGIC.isdisjoint(dirname) or not basename:
+        return sorted(globmod.glob(pattern))
+    try:
+        mtime_ns = os.stat(dirname or ".").st_mtime_ns
+    except OSError:
+        return []
+    if time.time_ns() - mtime_ns < SETTLE_NS:
+        return _match_dir(dirname, basename)
+    return list(_glob_cached(os.getcwd(), dirname, basename, mtime_ns))
 
-    if line[pos + 1] == "{":
-        # ${VAR} form
-        end = line.find("}", pos + 2)
-        if end == -1:
-            return ("${", 2)  # unterminated, treat literally
-        name = line[pos + 2 : end]
-        value = os.environ.get(name, "")
-        return (value, end - pos + 1)
 
-    # $VAR form: consume [a-zA-Z_][a-zA-Z0-9_]*
-    match = re.match(r"[a-zA-Z_][a-zA-Z0-9_]*", line[pos + 1 :])
-    if not match:
-        return ("$", 1)
+@lru_cache(maxsize=256)
+def _glob_cached(cwd: str, dirname: str, basename: str, mtime_ns: int) -> tuple[str, ...]:
+    """Match a pattern in one directory relative to cwd (cached by mtime)."""
+    return tuple(_match_dir(dirname, basename))
 
-    name = match.group(0)
-    value = os.environ.get(name, "")
-    return (value, 1 + len(name))
 
+def _match_dir(dirname: str, basename: str) -> list[str]:
+    """Match basename against the entries of dirname, like glob.glob does.
 
-def expand_globs(tokens: list[str]) -> list[str]:
-    """Expand glob patterns (* and ?) in tokens.
+    Names starting with '.' only match patterns that also start with '.'.
+    """
+    matcher = _compile_glob(basename)
+    include_hidden = basename.startswith(".")
+    matches: list[str] = []
+    try:
+        with os.scandir(dirname or ".") as it:
+            for entry in it:
+                name = entry.name
+                if (include_hidden or not name.startswith(".")) and matcher(name):
+                    matches.append(os.path.join(dirname, name) if dirname else name)
+    except OSError:
+        return []
+    matches.sort()
+    return matches
+
+
+@lru_cache(maxsize=256)
+def _compile_glob(pattern: str) -> Callable[[str], re.Match[str] | None]:
+    """Compile a single-segment glob pattern to a fullmatch function (cached)."""
+    return re.compile(fnmatch.translate(pattern)).fullmatch
+
+
+def expand_tilde(tokens: list[str], home: str | None = None) -> list[str]:
+    """Expand ~ at the start of tokens to the user's home directory.
+
+    `home` lets the caller pass a precomputed home directory (Shell keeps
+    one); otherwise it is expanded on demand. ~user forms still go through
+    os.path.expanduser.
+    """
+    if not any(t.startswith("~") for t in tokens):
+        return tokens
+    if home is None:
+        home = os.path.expanduser("~")
+    return [_expand_one_tilde(t, home) if t.startswith("~") else t for t in tokens]
 
-    Tokens that match no files are left unchanged.
-    Operator tokens are never glob-expanded.
+
+def expand_paths(tokens: list[str], home: str | None = None) -> list[str]:
+    """Apply tilde then glob expansion to tokens in a single pass.
+
+    Equivalent to expand_globs(expand_tilde(tokens, home)).
     """
     expanded: list[str] = []
     for token in tokens:
-        if token in OPERATORS:
+        if token.startswith("~"):
+            if home is None:
+                home = os.path.expanduser("~")
+            token = _expand_one_tilde(token, home)
+        if _MAGIC.isdisjoint(token):
             expanded.append(token)
-        elif "*" in token or "?" in token:
-            matches = globmod.glob(token)
-            if matches:
-                expanded.extend(sorted(matches))
-            else:
-                expanded.append(token)
+            continue
+        matches = _glob(token)
+        if matches:
+            expanded.extend(matches)
         else:
             expanded.append(token)
     return expanded
 
 
-def expand_tilde(tokens: list[str]) -> list[str]:
-    """Expand ~ at the start of tokens to the user's home directory."""
-    return [os.path.expanduser(t) if t.startswith("~") else t for t in tokens]
+def _expand_one_tilde(token: str, home: str) -> str:
+    """Expand a single token that starts with '~'."""
+    if token == "~":
+        return home
+    if token.startswith("~/"):
+        # HOME=/ must give /foo, not //foo, as with os.path.expanduser
+        return home.rstrip("/") + token[1:]
+    return os.path.expanduser(token)
@@ -1,13 +1,33 @@
 """Parse and execute command pipelines with I/O redirection."""
 
-import subprocess
+import contextlib
+import os
+import signal
 import sys
 from dataclasses import dataclass
+from typing import Final, TextIO
 
-from simpleshell.tokenizer import PIPE
+from simpleshell.tokenizer import (
+    AND,
+    OPERATORS,
+    OR,
+    PIPE,
+    REDIRECT_APPEND,
+    REDIRECT_IN,
+    REDIRECT_OUT,
+)
 
+_REDIRECT_TOKENS: Final = frozenset({REDIRECT_IN, REDIRECT_OUT, REDIRECT_APPEND})
 
-@dataclass
+# posix_spawn avoids duplicating the shell's page tables on every launch
+_HAVE_POSIX_SPAWN: Final = hasattr(os, "posix_spawnp")
+
+# Python ignores these; children get the defaults back, as with subprocess's
+# restore_signals, so e.g. `yes | head -1` ends quietly on SIGPIPE
+_RESTORED_SIGNALS: Final = (signal.SIGPIPE, signal.SIGXFSZ)
+
+
+@dataclass(slots=True)
 class Command:
     """A single command in a pipeline with its redirections."""
 
@@ -46,7 +66,7 @@ def split_pipeline(tokens: list[str]) -> list[list[str]]:
 def parse_redirections(segment: list[str]) -> Command:
     """Extract redirection operators from a command segment.
 
-    Uses match/case to dispatch on operator tokens.
+    Non-operator tokens take a single set lookup on the way to argv.
     Raises ValueError on missing filenames.
     """
     argv: list[str] = []
@@ -55,24 +75,22 @@ def parse_redirections(segment: list[str]) -> Command:
     stdout_append: bool = False
 
     i = 0
-    while i < len(segment):
+    n = len(segment)
+    while i < n:
         token = segment[i]
-
-        match token:
-            case "<":
-                if i + 1 >= len(segment):
-                    raise ValueError("syntax error near unexpected token `newline'")
-                stdin_file = segment[i + 1]
-                i += 2
-            case ">" | ">>":
-                if i + 1 >= len(segment):
-                    raise ValueError("syntax error near unexpected token `newline'")
-                stdout_file = segment[i + 1]
-                stdout_append = token == ">>"
-                i += 2
-            case _:
-                argv.append(token)
-                i += 1
+        if token not in _REDIRECT_TOKENS:
+            argv.append(token)
+            i += 1
+            continue
+
+        if i + 1 >= n:
+            raise ValueError("syntax error near unexpected token `newline'")
+        if token == REDIRECT_IN:
+            stdin_file = segment[i + 1]
+        else:
+            stdout_file = segment[i + 1]
+            stdout_append = token == REDIRECT_APPEND
+        i += 2
 
     if not argv:
         raise ValueError("syntax error: missing command")
@@ -85,15 +103,198 @@ def parse_redirections(segment: list[str]) -> Command:
     )
 
 
+def parse_line(tokens: list[str]) -> list[tuple[str | None, list[Command]]]:
+    """Parse a full token list into conditionally chained pipelines.
+
+    Does the work of splitting on && / ||, split_pipeline and
+    parse_redirections in a single scan over the tokens.
+
+    Returns [(None, first_pipeline), ("&&", second_pipeline), ...], where each
+    pipeline is a list of Commands. The first pipeline always has operator=None.
+
+    Raises ValueError on any syntax error, before anything is executed.
+    """
+    result: list[tuple[str | None, list[Command]]] = []
+    pipeline: list[Command] = []
+    pending_op: str | None = None
+
+    argv: list[str] = []
+    stdin_file: str | None = None
+    stdout_file: str | None = None
+    stdout_append = False
+
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+
+        if token in _REDIRECT_TOKENS:
+            if i + 1 >= n:
+                raise ValueError("syntax error near unexpected token `newline'")
+            target = tokens[i + 1]
+            if target in OPERATORS:
+                raise ValueError(f"syntax error near unexpected token `{target}'")
+            if token == REDIRECT_IN:
+                stdin_file = target
+            else:
+                stdout_file = target
+                stdout_append = token == REDIRECT_APPEND
+            i += 2
+            continue
+
+        if token in (PIPE, AND, OR):
+            if not argv:
+                if stdin_file is not None or stdout_file is not None:
+                    raise ValueError("syntax error: missing command")
+                raise ValueError(f"syntax error near unexpected token `{token}'")
+            pipeline.append(Command(argv, stdin_file, stdout_file, stdout_append))
+            argv = []
+            stdin_file = stdout_file = None
+            stdout_append = False
+            if token != PIPE:
+                result.append((pending_op, pipeline))
+                pipeline = []
+                pending_op = token
+            i += 1
+            continue
+
+        argv.append(token)
+        i += 1
+
+    if not argv:
+        if stdin_file is not None or stdout_file is not None:
+            raise ValueError("syntax error: missing command")
+        if pipeline:
+            raise ValueError(f"syntax error near unexpected token `{PIPE}'")
+        raise ValueError(f"syntax error near unexpected token `{pending_op or 'newline'}'")
+    pipeline.append(Command(argv, stdin_file, stdout_file, stdout_append))
+    result.append((pending_op, pipeline))
+
+    return result
+
+
 def execute_pipeline(commands: list[Command]) -> int:
     """Execute a pipeline of commands, returning the last exit code."""
     if len(commands) == 1:
-        return _execute_single(commands[0])
+        return execute_command(commands[0])
+    if not _HAVE_POSIX_SPAWN:
+        return _execute_multi_subprocess(commands)
     return _execute_multi(commands)
 
 
+def execute_command(command: Command) -> int:
+    """Execute a single, non-piped command, returning its exit code."""
+    if not _HAVE_POSIX_SPAWN:
+        return _execute_single_subprocess(command)
+    return _execute_single(command)
+
+
+def _spawn(argv: list[str], stdin_fd: int | None, stdout_fd: int | None) -> int:
+    """Start argv with posix_spawnp, wiring the given fds to stdin/stdout.
+
+    Returns the child pid. Raises FileNotFoundError if argv[0] is not found.
+    """
+    file_actions: list[tuple[int, int, int]] = []
+    if stdin_fd is not None:
+        file_actions.append((os.POSIX_SPAWN_DUP2, stdin_fd, 0))
+    if stdout_fd is not None:
+        file_actions.append((os.POSIX_SPAWN_DUP2, stdout_fd, 1))
+    return os.posix_spawnp(
+        argv[0], argv, os.environ, file_actions=file_actions, setsigdef=_RESTORED_SIGNALS
+    )
+
+
+def _wait(pid: int) -> int:
+    """Wait for a spawned child and return its exit code (-N if killed by signal N)."""
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
 def _execute_single(cmd: Command) -> int:
     """Execute a single command (no pipes)."""
+    try:
+        stdin_fh, stdout_fh = _open_redirects(cmd)
+    except FileNotFoundError:
+        return 1
+
+    try:
+        pid = _spawn(
+            cmd.argv,
+            stdin_fh.fileno() if stdin_fh else None,
+            stdout_fh.fileno() if stdout_fh else None,
+        )
+        return _wait(pid)
+    except FileNotFoundError:
+        print(f"simpleshell: command not found: {cmd.argv[0]}", file=sys.stderr)
+        return 127
+    finally:
+        if stdin_fh:
+            stdin_fh.close()
+        if stdout_fh:
+            stdout_fh.close()
+
+
+def _execute_multi(commands: list[Command]) -> int:
+    """Execute a multi-command pipeline, connecting stages with os.pipe()."""
+    pids: list[int] = []
+    opened_files: list[TextIO] = []
+    prev_read: int | None = None
+
+    try:
+        for i, cmd in enumerate(commands):
+            stdin_fd = prev_read
+            stdout_fd = None
+            next_read = next_write = None
+
+            # First command: may have stdin redirection
+            if i == 0 and cmd.stdin_file:
+                fh = open(cmd.stdin_file)  # noqa: SIM115
+                opened_files.append(fh)
+                stdin_fd = fh.fileno()
+
+            # Last command: may have stdout redirection
+            if i == len(commands) - 1:
+                if cmd.stdout_file:
+                    mode = "a" if cmd.stdout_append else "w"
+                    fh = open(cmd.stdout_file, mode)  # noqa: SIM115
+                    opened_files.append(fh)
+                    stdout_fd = fh.fileno()
+            else:
+                next_read, next_write = os.pipe()
+                stdout_fd = next_write
+
+            try:
+                pids.append(_spawn(cmd.argv, stdin_fd, stdout_fd))
+            finally:
+                # Close our copies in the parent so EOF propagates
+                if prev_read is not None:
+                    os.close(prev_read)
+                if next_write is not None:
+                    os.close(next_write)
+                prev_read = next_read
+
+        codes = [_wait(pid) for pid in pids]
+        return codes[-1]
+
+    except FileNotFoundError as e:
+        print(f"simpleshell: command not found: {e.filename}", file=sys.stderr)
+        if prev_read is not None:
+            os.close(prev_read)
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
+            _wait(pid)
+        return 127
+
+    finally:
+        for fh in opened_files:
+            fh.close()
+
+
+def _execute_single_subprocess(cmd: Command) -> int:
+    """Execute a single command via subprocess (platforms without posix_spawn)."""
+    import subprocess
+
     try:
         stdin_fh, stdout_fh = _open_redirects(cmd)
     except FileNotFoundError:
@@ -112,10 +313,12 @@ def _execute_single(cmd: Command) -> int:
             stdout_fh.close()
 
 
-def _execute_multi(commands: list[Command]) -> int:
+def _execute_multi_subprocess(commands: list[Command]) -> int:
     """Execute a multi-command pipeline with Popen chaining."""
-    processes: list[subprocess.Popen] = []
-    opened_files: list = []
+    import subprocess
+
+    processes: list[subprocess.Popen[bytes]] = []
+    opened_files: list[TextIO] = []
 
     try:
         for i, cmd in enumerate(commands):
@@ -166,10 +369,10 @@ def _execute_multi(commands: list[Command]) -> int:
             fh.close()
 
 
-def _open_redirects(cmd: Command) -> tuple:
+def _open_redirects(cmd: Command) -> tuple[TextIO | None, TextIO | None]:
     """Open file handles for redirections. Returns (stdin_fh, stdout_fh)."""
-    stdin_fh = None
-    stdout_fh = None
+    stdin_fh: TextIO | None = None
+    stdout_fh: TextIO | None = None
 
     if cmd.stdin_file:
         try:
@@ -1,17 +1,22 @@
 """Main shell loop: prompt, read, parse, dispatch, repeat."""
 
+import atexit
 import contextlib
 import os
-import readline
+import queue
 import sys
+import threading
 
-from simpleshell.builtins import BUILTIN_REGISTRY
-from simpleshell.completion import setup_completion
-from simpleshell.expansion import expand_globs, expand_tilde, expand_variables
-from simpleshell.pipeline import execute_pipeline, parse_redirections, split_pipeline
+from simpleshell.builtins import BUILTIN_REGISTRY, BuiltinHandler
+from simpleshell.expansion import expand_paths, expand_variables
+from simpleshell.pipeline import Command, execute_command, execute_pipeline, parse_line
 from simpleshell.tokenizer import AND, OR, tokenize
 
 HISTORY_FILE = os.path.expanduser("~/.simpleshell_history")
+HISTORY_LENGTH = 1000
+
+# Characters that make a line need expansion, quoting or operator handling
+_SHELL_META = frozenset("$~*?[|<>&'\"\\#")
 
 
 class Shell:
@@ -19,131 +24,189 @@ class Shell:
 
     def __init__(self) -> None:
         self.aliases: dict[str, str] = {}
+        # Tokenized alias values, keyed by the value itself
+        self._alias_token_cache: dict[str, tuple[str, ...]] = {}
         self.last_exit_code: int = 0
+        self._history_queue: queue.Queue[str | None] | None = None
+        self._history_thread: threading.Thread | None = None
+        # Nesting depth of `source`; lines run from a script are not history
+        self._scripted: int = 0
+        # Set by run() for a terminal session; history I/O is skipped otherwise
+        self._interactive: bool = False
+        self.refresh_home()
+
+    def set_alias(self, name: str, value: str) -> None:
+        """Define or redefine an alias."""
+        old = self.aliases.get(name)
+        if old is not None:
+            self._alias_token_cache.pop(old, None)
+        self.aliases[name] = value
+
+    def unset_alias(self, name: str) -> None:
+        """Remove an alias. Raises KeyError if it is not defined."""
+        self._alias_token_cache.pop(self.aliases.pop(name), None)
+
+    def refresh_home(self) -> None:
+        """Re-read the home directory (call after HOME changes)."""
+        self._home_env = os.environ.get("HOME")
+        self._home = os.path.expanduser("~")
+        self._home_slash = self._home + "/"
+        # The prompt depends on home, so drop the memoized one
+        self._last_cwd: str | None = None
+        self._last_prompt = ""
 
     def load_history(self) -> None:
-        with contextlib.suppress(FileNotFoundError, PermissionError, OSError):
-            readline.read_history_file(HISTORY_FILE)
+        """Load the last HISTORY_LENGTH entries of the history file."""
+        import readline
+
+        try:
+            lines = _tail_lines(HISTORY_FILE, HISTORY_LENGTH)
+        except OSError:
+            return
+        for line in lines:
+            readline.add_history(line)
 
     def save_history(self) -> None:
-        with contextlib.suppress(PermissionError, OSError):
-            readline.write_history_file(HISTORY_FILE)
+        """Flush pending history lines and trim the file to HISTORY_LENGTH.
+
+        The writer thread has already appended this session's lines, so
+        nothing is rewritten unless the file has grown past the limit.
+        """
+        self._stop_history_writer()
+        if not self._interactive:
+            return
+        import readline
+
+        with contextlib.suppress(OSError):
+            readline.append_history_file(0, HISTORY_FILE)
+
+    def record_history(self, line: str) -> None:
+        """Queue a line for appending to the history file, if the writer is running."""
+        if self._history_queue is not None:
+            self._history_queue.put(line)
+
+    def _start_history_writer(self) -> None:
+        """Start the background thread that appends history lines as they are entered."""
+        self._history_queue = queue.Queue()
+        self._history_thread = threading.Thread(
+            target=_write_history, args=(self._history_queue,), daemon=True
+        )
+        self._history_thread.start()
+
+    def _stop_history_writer(self) -> None:
+        """Drain pending history lines and stop the writer thread."""
+        if self._history_queue is None or self._history_thread is None:
+            return
+        self._history_queue.put(None)
+        self._history_thread.join()
+        self._history_queue = None
+        self._history_thread = None
 
     def get_prompt(self) -> str:
+        # HOME can change without going through export (e.g. os.environ edits)
+        if os.environ.get("HOME") != self._home_env:
+            self.refresh_home()
         cwd = os.getcwd()
-        home = os.path.expanduser("~")
-        if cwd == home:
-            display = "~"
-        elif cwd.startswith(home + "/"):
-            display = "~/" + cwd[len(home) + 1 :]
+        # Most commands don't change directory; reuse the last prompt
+        if cwd == self._last_cwd:
+            return self._last_prompt
+        home_slash = self._home_slash
+        if cwd == self._home:
+            prompt = "~ $ "
+        elif cwd.startswith(home_slash):
+            prompt = f"~/{cwd[len(home_slash) :]} $ "
         else:
-            display = cwd
-        return f"{display} $ "
+            prompt = f"{cwd} $ "
+        self._last_cwd = cwd
+        self._last_prompt = prompt
+        return prompt
 
     def run_command(self, line: str) -> None:
         """Full processing pipeline:
 
         1. Expand environment variables ($VAR, ${VAR})
-        2. Tokenize (shlex-based, operator-aware)
-        3. Expand tilde (~)
-        4. Expand globs (* ?)
-        5. Expand aliases (first token of each command list segment)
-        6. Split on && / || (command list operators)
-        7. For each segment: split on pipes, parse redirections, execute
+        2. Tokenize (quote- and operator-aware)
+        3. Expand tilde (~) and globs (* ? [...]) in one pass
+        4. Expand aliases (first token of each command list segment)
+        5. Parse && / ||, pipes and redirections in one pass
+        6. Execute each pipeline conditionally
+
+        Lines without any shell metacharacters skip expansion, and the
+        tokenizer only has to split them on whitespace.
         """
-        # 1. Variable expansion on raw string (respects quoting)
-        line = expand_variables(line)
+        if not self._scripted:
+            self.record_history(line)
 
-        # 2. Tokenize
-        try:
+        if _SHELL_META.isdisjoint(line):
+            # Not str.split(): it would also split on \v, \f, NBSP etc.
             tokens = tokenize(line)
-        except ValueError as e:
-            print(f"simpleshell: {e}", file=sys.stderr)
-            return
+        else:
+            # 1. Variable expansion on raw string (respects quoting)
+            line = expand_variables(line)
+
+            # 2. Tokenize
+            try:
+                tokens = tokenize(line)
+            except ValueError as e:
+                print(f"simpleshell: {e}", file=sys.stderr)
+                return
+
+            # 3. Tilde and glob expansion
+            tokens = expand_paths(tokens, self._home)
 
         if not tokens:
             return
 
-        # 3. Tilde expansion
-        tokens = expand_tilde(tokens)
-
-        # 4. Glob expansion
-        tokens = expand_globs(tokens)
+        # 4. Alias expansion at the start of each && / || segment
+        tokens = self._expand_segment_aliases(tokens)
 
-        # 5-7. Split on && / || and execute each pipeline conditionally
+        # 5. Parse the whole line up front
         try:
-            cmd_list = self._split_command_list(tokens)
+            cmd_list = parse_line(tokens)
         except ValueError as e:
             print(f"simpleshell: {e}", file=sys.stderr)
+            self.last_exit_code = 2
             return
 
-        for operator, segment_tokens in cmd_list:
-            # Check condition from previous pipeline
-            match operator:
-                case "&&" if self.last_exit_code != 0:
-                    continue
-                case "||" if self.last_exit_code == 0:
-                    continue
-
-            # Alias expansion per segment
-            segment_tokens = self._expand_aliases(segment_tokens)
-
-            self._execute_segment(segment_tokens)
-
-    @staticmethod
-    def _split_command_list(tokens: list[str]) -> list[tuple[str | None, list[str]]]:
-        """Split tokens on && and || into (operator, segment) pairs.
+        # 6. Execute each pipeline, checking the condition from the previous one
+        for operator, commands in cmd_list:
+            if operator == AND and self.last_exit_code != 0:
+                continue
+            if operator == OR and self.last_exit_code == 0:
+                continue
 
-        Returns [(None, first_segment), ("&&", second_segment), ("||", third), ...].
-        The first segment always has operator=None.
-        """
-        result: list[tuple[str | None, list[str]]] = []
-        current: list[str] = []
-        pending_op: str | None = None
+            self._execute_commands(commands)
 
+    def _expand_segment_aliases(self, tokens: list[str]) -> list[str]:
+        """Expand aliases in the first token of every && / || segment."""
+        aliases = self.aliases
+        if not aliases:
+            return tokens
+        expanded: list[str] = []
+        at_start = True
         for token in tokens:
-            if token in (AND, OR):
-                if not current:
-                    raise ValueError(f"syntax error near unexpected token `{token}'")
-                result.append((pending_op, current))
-                pending_op = token
-                current = []
+            if at_start and token in aliases:
+                expanded.extend(self._expand_aliases([token]))
             else:
-                current.append(token)
-
-        if not current:
-            op = pending_op or "newline"
-            raise ValueError(f"syntax error near unexpected token `{op}'")
-        result.append((pending_op, current))
-
-        return result
+                expanded.append(token)
+            at_start = token in (AND, OR)
+        return expanded
 
-    def _execute_segment(self, tokens: list[str]) -> None:
-        """Execute a single pipeline segment (everything between && / ||)."""
-        try:
-            segments = split_pipeline(tokens)
-        except ValueError as e:
-            print(f"simpleshell: {e}", file=sys.stderr)
-            self.last_exit_code = 2
-            return
-
-        try:
-            commands = [parse_redirections(seg) for seg in segments]
-        except ValueError as e:
-            print(f"simpleshell: {e}", file=sys.stderr)
-            self.last_exit_code = 2
-            return
-
-        # Builtin check (single command, non-piped only)
+    def _execute_commands(self, commands: list[Command]) -> None:
+        """Execute one parsed pipeline (everything between && / ||)."""
+        # Single commands (the common case) may be builtins and need no pipes
         if len(commands) == 1:
             cmd = commands[0]
-            if cmd.argv[0] in BUILTIN_REGISTRY:
-                self._run_builtin(cmd)
-                return
+            handler = BUILTIN_REGISTRY.get(cmd.argv[0])
+            if handler is not None:
+                self._run_builtin(cmd, handler)
+            else:
+                self.last_exit_code = execute_command(cmd)
+            return
 
         self.last_exit_code = execute_pipeline(commands)
 
-    def _run_builtin(self, cmd) -> None:
+    def _run_builtin(self, cmd: Command, handler: BuiltinHandler) -> None:
         """Run a builtin command, handling stdout redirection."""
         old_stdout = None
         fh = None
@@ -153,7 +216,6 @@ class Shell:
             old_stdout = sys.stdout
             sys.stdout = fh
         try:
-            handler = BUILTIN_REGISTRY[cmd.argv[0]]
             self.last_exit_code = handler(cmd.argv[1:], self)
         finally:
             if old_stdout is not None:
@@ -163,23 +225,42 @@ class Shell:
 
     def _expand_aliases(self, tokens: list[str]) -> list[str]:
         """Expand aliases in the first token, with loop detection."""
-        seen: set[str] = set()
-        while tokens and tokens[0] in self.aliases and tokens[0] not in seen:
+        aliases = self.aliases
+        if not tokens or tokens[0] not in aliases:
+            return tokens
+        # Alias chains are short, so a list beats hashing into a set
+        seen: list[str] = []
+        while tokens:
             name = tokens[0]
-            seen.add(name)
-            alias_value = self.aliases[name]
-            try:
-                alias_tokens = tokenize(alias_value)
-            except ValueError:
+            alias_value = aliases.get(name)
+            if alias_value is None or name in seen:
                 break
-            tokens = alias_tokens + tokens[1:]
+            seen.append(name)
+            alias_tokens = self._alias_token_cache.get(alias_value)
+            if alias_tokens is None:
+                try:
+                    alias_tokens = tuple(tokenize(alias_value))
+                except ValueError:
+                    break
+                self._alias_token_cache[alias_value] = alias_tokens
+            tokens = [*alias_tokens, *tokens[1:]]
         return tokens
 
     def run(self) -> None:
         """Main shell loop."""
-        self.load_history()
-        readline.set_history_length(1000)
-        setup_completion()
+        if sys.stdin.isatty():
+            # readline, history and completion only matter for interactive use
+            import readline
+
+            from simpleshell.completion import setup_completion
+
+            self._interactive = True
+            self.load_history()
+            readline.set_history_length(HISTORY_LENGTH)
+            setup_completion()
+            self._start_history_writer()
+            # Covers exit, EOF and uncaught exceptions alike
+            atexit.register(self.save_history)
 
         while True:
             try:
@@ -194,10 +275,48 @@ class Shell:
 
             self.run_command(line)
 
-        self.save_history()
+
+def _tail_lines(path: str, count: int) -> list[str]:
+    """Return the last count lines of a file, reading backwards in 4 KiB blocks."""
+    blocks: list[bytes] = []
+    newlines = 0
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0 and newlines <= count:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            newlines += block.count(b"\n")
+            blocks.append(block)
+    data = b"".join(reversed(blocks))
+    return data.decode("utf-8", "replace").splitlines()[-count:]
 
 
 def main() -> None:
     """Entry point."""
     shell = Shell()
     shell.run()
+
+
+def _write_history(history_queue: queue.Queue[str | None]) -> None:
+    """Writer thread: append queued lines, coalescing whatever is pending.
+
+    A None item drains the queue and stops the thread.
+    """
+    while True:
+        pending = [history_queue.get()]
+        while True:
+            try:
+                pending.append(history_queue.get_nowait())
+            except queue.Empty:
+                break
+        lines = [f"{line}\n" for line in pending if line is not None]
+        if lines:
+            try:
+                with open(HISTORY_FILE, "a") as f:
+                    f.writelines(lines)
+            except OSError:
+                pass
+        if None in pending:
+            return
@@ -1,45 +1,136 @@
 """Tokenize shell input into tokens, properly handling operators and quotes."""
 
-import shlex
+import re
+import sys
+from functools import lru_cache
+from typing import Final
 
-# Characters that are part of "words" (filenames, arguments), not operators
-_EXTRA_WORDCHARS = ".-_/~${}*?@%+=,:0123456789"
+PIPE: Final = sys.intern("|")
+REDIRECT_OUT: Final = sys.intern(">")
+REDIRECT_APPEND: Final = sys.intern(">>")
+REDIRECT_IN: Final = sys.intern("<")
+AND: Final = sys.intern("&&")
+OR: Final = sys.intern("||")
+OPERATORS: Final = frozenset({PIPE, REDIRECT_OUT, REDIRECT_APPEND, REDIRECT_IN, AND, OR})
 
-PIPE = "|"
-REDIRECT_OUT = ">"
-REDIRECT_APPEND = ">>"
-REDIRECT_IN = "<"
-AND = "&&"
-OR = "||"
-OPERATORS = {PIPE, REDIRECT_OUT, REDIRECT_APPEND, REDIRECT_IN, AND, OR}
+# Operator tokens are emitted as these exact objects, so the parser's string
+# comparisons and set/dict lookups hit the identity fast path.
+_CANONICAL: Final[dict[str, str]] = {op: op for op in OPERATORS}
+
+_WHITESPACE: Final = " \t\r\n"
+_OPERATOR_CHARS: Final = "|&<>"
+# Operator characters that double up: '>>', '&&', '||'
+_DOUBLING_CHARS: Final = ">&|"
+
+# A run of plain word characters: anything that is not whitespace, a quote,
+# a backslash or an operator character.
+_WORD_RUN: Final = re.compile(r"[^ \t\r\n'\"\\|&<>]+")
+
+# Characters that need the full scanner: quotes, escapes and comments
+_QUOTING: Final = frozenset("'\"\\#")
+
+# Without quoting a line is only words and operators, so one compiled
+# pattern tokenizes it entirely inside the regex engine.
+_PLAIN_TOKEN: Final = re.compile(r">>|&&|\|\||[|&<>]|[^ \t\r\n|&<>]+")
 
 
 def tokenize(line: str) -> list[str]:
     """Tokenize a shell input line.
 
-    Uses shlex for quote handling and escaping, with custom wordchars
-    so that |, >, < are recognized as operator tokens even when adjacent
-    to words (e.g., 'echo foo>bar' -> ['echo', 'foo', '>', 'bar']).
+    A single left-to-right scan with POSIX-style quoting: single quotes are
+    literal, double quotes honour \\" and \\\\, and a backslash outside quotes
+    escapes the next character. Adjacent quoted and unquoted parts join into
+    one word, so 'foo''bar' -> 'foobar'.
 
-    Consecutive '>' '>' are merged into '>>', '&' '&' into '&&', '|' '|' into '||'.
+    |, >, < and & are recognized as operator tokens even when adjacent to
+    words (e.g., 'echo foo>bar' -> ['echo', 'foo', '>', 'bar']), and '>>',
+    '&&' and '||' are emitted as single tokens. A '#' at the start of a word
+    begins a comment.
+
+    Raises ValueError on an unterminated quote or a trailing backslash.
     """
-    lexer = shlex.shlex(line, posix=True)
-    lexer.whitespace_split = False
-    lexer.wordchars += _EXTRA_WORDCHARS
+    return list(_tokenize_cached(line))
+
 
-    raw_tokens = list(lexer)
-    return _merge_operators(raw_tokens)
+@lru_cache(maxsize=512)
+def _tokenize_cached(line: str) -> tuple[str, ...]:
+    """Tokenize a line (cached; users re-enter the same commands)."""
+    if _QUOTING.isdisjoint(line):
+        return tuple([_CANONICAL.get(token, token) for token in _PLAIN_TOKEN.findall(line)])
+    return _scan(line)
 
 
-def _merge_operators(tokens: list[str]) -> list[str]:
-    """Merge consecutive '>' into '>>', '&' '&' into '&&', '|' '|' into '||'."""
-    merged: list[str] = []
+def _scan(line: str) -> tuple[str, ...]:
+    """Tokenize a line that may contain quotes, escapes or comments."""
+    tokens: list[str] = []
     i = 0
-    while i < len(tokens):
-        if i + 1 < len(tokens) and tokens[i] == tokens[i + 1] and tokens[i] in (">", "&", "|"):
-            merged.append(tokens[i] * 2)
-            i += 2
-        else:
-            merged.append(tokens[i])
+    n = len(line)
+
+    while i < n:
+        ch = line[i]
+
+        if ch in _WHITESPACE:
             i += 1
-    return merged
+            continue
+
+        if ch == "#":
+            break
+
+        if ch in _OPERATOR_CHARS:
+            if ch in _DOUBLING_CHARS and i + 1 < n and line[i + 1] == ch:
+                tokens.append(_CANONICAL[ch * 2])
+                i += 2
+            else:
+                tokens.append(_CANONICAL.get(ch, ch))
+                i += 1
+            continue
+
+        # A word: plain runs, quoted runs and escapes until a separator
+        parts: list[str] = []
+        while i < n:
+            ch = line[i]
+            if ch == "'":
+                end = line.find("'", i + 1)
+                if end == -1:
+                    raise ValueError("No closing quotation")
+                parts.append(line[i + 1 : end])
+                i = end + 1
+            elif ch == '"':
+                i = _scan_double_quoted(line, i + 1, parts)
+            elif ch == "\\":
+                if i + 1 >= n:
+                    raise ValueError("No escaped character")
+                parts.append(line[i + 1])
+                i += 2
+            else:
+                match = _WORD_RUN.match(line, i)
+                if match is None:
+                    break
+                parts.append(match.group())
+                i = match.end()
+        tokens.append("".join(parts))
+
+    return tuple(tokens)
+
+
+def _scan_double_quoted(line: str, i: int, parts: list[str]) -> int:
+    """Scan a double-quoted run starting just after the opening quote.
+
+    Appends the unquoted text to parts and returns the index after the
+    closing quote. Inside double quotes a backslash only escapes '"' and
+    '\\'; before any other character it is kept literally.
+    """
+    while True:
+        end = line.find('"', i)
+        if end == -1:
+            raise ValueError("No closing quotation")
+        backslash = line.find("\\", i, end)
+        if backslash == -1:
+            parts.append(line[i:end])
+            return end + 1
+        parts.append(line[i:backslash])
+        if backslash + 1 >= len(line):
+            raise ValueError("No closing quotation")
+        escaped = line[backslash + 1]
+        parts.append(escaped if escaped in '"\\' else "\\" + escaped)
+        i = backslash + 2
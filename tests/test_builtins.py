@@ -1,6 +1,7 @@
 """Tests for the builtins module."""
 
 import os
+import stat
 
 import pytest
 
@@ -19,6 +20,8 @@ from simpleshell.builtins import (
     builtin_unalias,
     builtin_unset,
     builtin_which,
+    invalidate_path_cache,
+    which_cached,
 )
 from simpleshell.shell import Shell
 
@@ -43,6 +46,11 @@ class TestBuiltinRegistry:
 
 
 class TestCd:
+    @pytest.fixture(autouse=True)
+    def _restore_cwd(self, monkeypatch):
+        # cd changes the process cwd; put it back for the following tests
+        monkeypatch.chdir(os.getcwd())
+
     def test_cd_to_directory(self, tmp_path, shell):
         target = str(tmp_path)
         result = builtin_cd([target], shell)
@@ -87,7 +95,8 @@ class TestExport:
         assert result == 0
         assert os.environ["TEST_SHELL_VAR"] == "hello"
 
-    def test_export_set_with_equals_in_value(self, shell):
+    def test_export_set_with_equals_in_value(self, shell, monkeypatch):
+        monkeypatch.delenv("KEY", raising=False)
         result = builtin_export(["KEY=a=b=c"], shell)
         assert result == 0
         assert os.environ["KEY"] == "a=b=c"
@@ -99,7 +108,9 @@ class TestExport:
         output = capsys.readouterr().out
         assert "TEST_EXPORT_LIST" in output
 
-    def test_export_multiple(self, shell):
+    def test_export_multiple(self, shell, monkeypatch):
+        monkeypatch.delenv("A", raising=False)
+        monkeypatch.delenv("B", raising=False)
         builtin_export(["A=1", "B=2"], shell)
         assert os.environ["A"] == "1"
         assert os.environ["B"] == "2"
@@ -209,10 +220,60 @@ class TestWhich:
         assert result == 1
         assert "no nonexistent_cmd_xyz in PATH" in capsys.readouterr().err
 
-    def test_which_multiple(self, shell, capsys):
+    def test_which_multiple(self, shell):
         result = builtin_which(["sh", "nonexistent_cmd_xyz"], shell)
         assert result == 1  # returns 1 because one failed
 
+    def test_which_after_path_export(self, shell, capsys, tmp_path, monkeypatch):
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.touch()
+        fake_bin.chmod(0o755)
+        assert builtin_which(["my_fake_cmd"], shell) == 1
+        monkeypatch.setenv("PATH", os.environ["PATH"])
+        builtin_export([f"PATH={tmp_path}"], shell)
+        assert builtin_which(["my_fake_cmd"], shell) == 0
+        assert str(fake_bin) in capsys.readouterr().out
+
+
+class TestWhichCached:
+    def test_finds_command(self):
+        invalidate_path_cache()
+        assert which_cached("sh") is not None
+
+    def test_missing_command(self):
+        invalidate_path_cache()
+        assert which_cached("nonexistent_cmd_xyz") is None
+
+    def test_invalidation_picks_up_new_path(self, tmp_path, monkeypatch):
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        invalidate_path_cache()
+        assert which_cached("my_fake_cmd") is None
+        monkeypatch.setenv("PATH", str(tmp_path))
+        invalidate_path_cache()
+        assert which_cached("my_fake_cmd") == str(fake_bin)
+
+    def test_miss_not_cached(self, shell, capsys, tmp_path, monkeypatch):
+        monkeypatch.setenv("PATH", str(tmp_path))
+        invalidate_path_cache()
+        assert builtin_which(["my_fake_cmd"], shell) == 1
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        assert builtin_which(["my_fake_cmd"], shell) == 0
+        assert str(fake_bin) in capsys.readouterr().out
+
+    def test_relative_name_follows_cwd(self, tmp_path, monkeypatch):
+        (tmp_path / "sub").mkdir()
+        fake_bin = tmp_path / "foo"
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        monkeypatch.chdir(tmp_path)
+        assert which_cached("./foo") == "./foo"
+        monkeypatch.chdir(tmp_path / "sub")
+        assert which_cached("./foo") is None
+
 
 class TestType:
     def test_type_builtin(self, shell, capsys):
@@ -239,7 +300,7 @@ class TestType:
 
 
 class TestSource:
-    def test_source_file(self, tmp_path, shell, capsys):
+    def test_source_file(self, tmp_path, shell):
         script = tmp_path / "cmds.sh"
         script.write_text("pwd\n")
         result = builtin_source([str(script)], shell)
@@ -254,12 +315,19 @@ class TestSource:
         # pwd should have printed something, comment should be skipped
         assert len(output.strip()) > 0
 
-    def test_source_skips_empty_lines(self, tmp_path, shell, capsys):
+    def test_source_skips_empty_lines(self, tmp_path, shell):
         script = tmp_path / "cmds.sh"
         script.write_text("\n\npwd\n\n")
         result = builtin_source([str(script)], shell)
         assert result == 0
 
+    def test_source_invalid_utf8(self, tmp_path, shell, capsys):
+        script = tmp_path / "cmds.sh"
+        script.write_bytes(b"# caf\xe9\npwd\n")
+        result = builtin_source([str(script)], shell)
+        assert result == 0
+        assert len(capsys.readouterr().out.strip()) > 0
+
     def test_source_nonexistent(self, shell, capsys):
         result = builtin_source(["/nonexistent_file_xyz"], shell)
         assert result == 1
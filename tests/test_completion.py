@@ -1,13 +1,15 @@
 """Tests for the completion module."""
 
+import os
 import stat
 
+from simpleshell import completion
 from simpleshell.builtins import BUILTIN_REGISTRY
 from simpleshell.completion import (
     _complete_command,
     _complete_path,
     _get_path_commands,
-    invalidate_path_cache,
+    _prefix_range,
 )
 
 
@@ -57,6 +59,12 @@ class TestCompletePath:
         filenames = [r for r in result if r.endswith(".txt")]
         assert filenames == sorted(filenames)
 
+    def test_symlink_to_directory_gets_slash(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "realdir").mkdir()
+        (tmp_path / "linkdir").symlink_to(tmp_path / "realdir")
+        assert _complete_path("link") == ["linkdir/"]
+
     def test_nonexistent_dir(self):
         result = _complete_path("/nonexistent_dir_xyz/foo")
         assert result == []
@@ -80,26 +88,52 @@ class TestCompleteCommand:
         for name in BUILTIN_REGISTRY:
             assert name in result
 
+    def test_results_sorted_and_unique(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        fake_bin = tmp_path / "cd"  # also a builtin and a local file
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        (tmp_path / "cat_notes.txt").touch()
+        monkeypatch.setenv("PATH", str(tmp_path))
+        result = _complete_command("c")
+        assert result == sorted(set(result))
+        assert result.count("cd") == 1
+        assert "cat_notes.txt" in result
+
+
+class TestPrefixRange:
+    def test_matches_prefix(self):
+        names = ("cat", "cd", "chmod", "cp", "ls")
+        assert _prefix_range(names, "c") == ("cat", "cd", "chmod", "cp")
+        assert _prefix_range(names, "ch") == ("chmod",)
+
+    def test_empty_prefix_returns_all(self):
+        names = ("a", "b")
+        assert _prefix_range(names, "") == names
+
+    def test_no_match(self):
+        assert _prefix_range(("a", "b"), "z") == ()
+
+    def test_next_character_outside_bmp(self):
+        names = ("ab", "a\U0001f600x", "b")
+        assert _prefix_range(names, "a") == ("ab", "a\U0001f600x")
+
 
 class TestGetPathCommands:
-    def test_returns_frozenset(self):
-        invalidate_path_cache()
+    def test_returns_sorted_tuple(self):
         result = _get_path_commands()
-        assert isinstance(result, frozenset)
+        assert isinstance(result, tuple)
+        assert list(result) == sorted(set(result))
 
     def test_contains_common_commands(self):
-        invalidate_path_cache()
         result = _get_path_commands()
         # 'sh' should exist on any unix system
         assert "sh" in result
 
-    def test_cache_invalidation(self):
-        result1 = _get_path_commands()
-        invalidate_path_cache()
-        result2 = _get_path_commands()
-        # Both should be valid frozensets (content may be same)
-        assert isinstance(result1, frozenset)
-        assert isinstance(result2, frozenset)
+    def test_unchanged_path_reuses_result(self, tmp_path, monkeypatch):
+        os.utime(tmp_path, ns=(0, 10**9))
+        monkeypatch.setenv("PATH", str(tmp_path))
+        assert _get_path_commands() is _get_path_commands()
 
     def test_custom_path(self, tmp_path, monkeypatch):
         # Create a fake executable in a temp dir
@@ -107,6 +141,63 @@ class TestGetPathCommands:
         fake_bin.touch()
         fake_bin.chmod(stat.S_IRWXU)
         monkeypatch.setenv("PATH", str(tmp_path))
-        invalidate_path_cache()
         result = _get_path_commands()
         assert "my_fake_cmd" in result
+
+    def test_skips_non_executables_and_directories(self, tmp_path, monkeypatch):
+        (tmp_path / "plain_file").touch()
+        (tmp_path / "subdir").mkdir()
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        monkeypatch.setenv("PATH", str(tmp_path))
+        assert _get_path_commands() == ("my_fake_cmd",)
+
+    def test_follows_symlinked_executables(self, tmp_path, monkeypatch):
+        target = tmp_path / "real_cmd"
+        target.touch()
+        target.chmod(stat.S_IRWXU)
+        bindir = tmp_path / "bin"
+        bindir.mkdir()
+        (bindir / "linked_cmd").symlink_to(target)
+        (bindir / "dangling").symlink_to(tmp_path / "missing")
+        monkeypatch.setenv("PATH", str(bindir))
+        assert _get_path_commands() == ("linked_cmd",)
+
+    def test_new_executable_picked_up_without_invalidation(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PATH", str(tmp_path))
+        assert _get_path_commands() == ()
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.touch()
+        fake_bin.chmod(stat.S_IRWXU)
+        os.utime(tmp_path, ns=(0, 10**18))
+        assert _get_path_commands() == ("my_fake_cmd",)
+
+    def test_multiple_directories(self, tmp_path, monkeypatch):
+        dirs = []
+        for i in range(3):
+            d = tmp_path / f"bin{i}"
+            d.mkdir()
+            cmd = d / f"cmd{i}"
+            cmd.touch()
+            cmd.chmod(stat.S_IRWXU)
+            dirs.append(str(d))
+        monkeypatch.setenv("PATH", os.pathsep.join([*dirs, str(tmp_path / "missing")]))
+        assert _get_path_commands() == ("cmd0", "cmd1", "cmd2")
+
+    def test_unchanged_directory_not_rescanned(self, tmp_path, monkeypatch):
+        dirs = [tmp_path / "a", tmp_path / "b"]
+        for d in dirs:
+            d.mkdir()
+            os.utime(d, ns=(0, 10**9))
+        monkeypatch.setenv("PATH", os.pathsep.join(map(str, dirs)))
+        _get_path_commands()
+
+        scanned = []
+        real_scan = completion._scan_path_dir
+        monkeypatch.setattr(
+            completion, "_scan_path_dir", lambda d: scanned.append(d) or real_scan(d)
+        )
+        os.utime(dirs[1], ns=(0, 2 * 10**9))
+        _get_path_commands()
+        assert scanned == [str(dirs[1])]
@@ -2,7 +2,8 @@
 
 import os
 
-from simpleshell.expansion import expand_globs, expand_tilde, expand_variables
+from simpleshell import expansion
+from simpleshell.expansion import expand_globs, expand_paths, expand_tilde, expand_variables
 
 
 class TestExpandVariables:
@@ -73,6 +74,20 @@ class TestExpandVariables:
         monkeypatch.setenv("MY_VAR_123", "value")
         assert expand_variables("$MY_VAR_123") == "value"
 
+    def test_single_quote_inside_double_quotes(self, monkeypatch):
+        monkeypatch.setenv("X", "yes")
+        assert expand_variables('echo "it\'s $X"') == 'echo "it\'s yes"'
+
+    def test_escaped_dollar_inside_double_quotes(self, monkeypatch):
+        monkeypatch.setenv("FOO", "bar")
+        assert expand_variables('echo "\\$FOO $FOO"') == 'echo "\\$FOO bar"'
+
+    def test_unquoted_line_matches_general_path(self, monkeypatch):
+        monkeypatch.setenv("FOO", "bar")
+        line = "echo $FOO ${FOO}x \\$FOO $UNDEF-$FOO"
+        assert expand_variables(line) == "echo bar barx \\$FOO -bar"
+        assert expand_variables(line) == expansion._VAR_RE.sub(expansion._substitute, line)
+
     def test_home_var(self, monkeypatch):
         monkeypatch.setenv("HOME", "/Users/test")
         assert expand_variables("cd $HOME") == "cd /Users/test"
@@ -111,6 +126,14 @@ class TestExpandGlobs:
         assert expand_globs(["&&"]) == ["&&"]
         assert expand_globs(["||"]) == ["||"]
 
+    def test_plain_tokens_skip_filesystem(self, monkeypatch):
+        def fail(token):
+            raise AssertionError(f"globbed {token!r}")
+
+        monkeypatch.setattr(expansion, "_glob", fail)
+        tokens = ["git", "commit", "-m", "msg", "|", "&&"]
+        assert expand_globs(tokens) == tokens
+
     def test_multiple_globs(self, tmp_path, monkeypatch):
         monkeypatch.chdir(tmp_path)
         (tmp_path / "a.py").touch()
@@ -118,6 +141,44 @@ class TestExpandGlobs:
         result = expand_globs(["*.py", "*.txt"])
         assert result == ["a.py", "b.txt"]
 
+    def test_bracket_glob_matches(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a1.txt").touch()
+        (tmp_path / "a2.txt").touch()
+        (tmp_path / "a3.txt").touch()
+        assert expand_globs(["[ab][12].txt"]) == ["a1.txt", "a2.txt"]
+
+    def test_cached_glob_sees_new_files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.py").touch()
+        os.utime(tmp_path, (0, 0))  # settled directory, eligible for caching
+        assert expand_globs(["*.py"]) == ["a.py"]
+        assert expand_globs(["*.py"]) == ["a.py"]
+        (tmp_path / "b.py").touch()
+        assert expand_globs(["*.py"]) == ["a.py", "b.py"]
+
+    def test_star_skips_hidden_files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".hidden").touch()
+        (tmp_path / "visible").touch()
+        assert expand_globs(["*"]) == ["visible"]
+        assert expand_globs([".*"]) == [".hidden"]
+
+    def test_glob_in_subdirectory(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "a.txt").touch()
+        (tmp_path / "sub" / "b.md").touch()
+        assert expand_globs(["sub/*.txt"]) == ["sub/a.txt"]
+        assert expand_globs([f"{tmp_path}/sub/*.txt"]) == [f"{tmp_path}/sub/a.txt"]
+
+    def test_glob_magic_in_directory(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for d in ("x1", "x2"):
+            (tmp_path / d).mkdir()
+            (tmp_path / d / "f.txt").touch()
+        assert expand_globs(["x*/f.txt"]) == ["x1/f.txt", "x2/f.txt"]
+
     def test_glob_results_sorted(self, tmp_path, monkeypatch):
         monkeypatch.chdir(tmp_path)
         (tmp_path / "c.py").touch()
@@ -149,3 +210,41 @@ class TestExpandTilde:
 
     def test_empty_list(self):
         assert expand_tilde([]) == []
+
+    def test_explicit_home(self):
+        result = expand_tilde(["~", "~/foo", "bar"], "/home/test")
+        assert result == ["/home/test", "/home/test/foo", "bar"]
+
+    def test_tilde_user_falls_back(self):
+        assert expand_tilde(["~root"], "/home/test") == [os.path.expanduser("~root")]
+
+    def test_follows_home_changes(self, tmp_path, monkeypatch):
+        assert expand_tilde(["~"]) == [os.path.expanduser("~")]
+        monkeypatch.setenv("HOME", str(tmp_path))
+        assert expand_tilde(["~", "~/x"]) == [str(tmp_path), f"{tmp_path}/x"]
+
+    def test_root_home(self, monkeypatch):
+        monkeypatch.setenv("HOME", "/")
+        tokens = ["~", "~/foo"]
+        assert expand_tilde(tokens) == expand_paths(tokens) == ["/", "/foo"]
+        assert expand_tilde(tokens, "/") == [os.path.expanduser(t) for t in tokens]
+
+
+class TestExpandPaths:
+    def test_tilde_then_glob(self, tmp_path):
+        (tmp_path / "a.txt").touch()
+        (tmp_path / "b.txt").touch()
+        result = expand_paths(["ls", "~/*.txt"], str(tmp_path))
+        assert result == ["ls", f"{tmp_path}/a.txt", f"{tmp_path}/b.txt"]
+
+    def test_matches_separate_passes(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "x.py").touch()
+        tokens = ["echo", "~", "*.py", "|", "*.none", "~/foo"]
+        assert expand_paths(tokens, "/home/test") == expand_globs(
+            expand_tilde(tokens, "/home/test")
+        )
+
+    def test_default_home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        assert expand_paths(["~/x", "y"]) == [f"{tmp_path}/x", "y"]
@@ -1,110 +1,172 @@
 """Tests for the pipeline module."""
 
+import os
+
 import pytest
 
-from simpleshell.pipeline import Command, parse_redirections, split_pipeline
+from simpleshell.pipeline import (
+    Command,
+    execute_command,
+    execute_pipeline,
+    parse_line,
+    parse_redirections,
+    split_pipeline,
+)
 
 
 class TestSplitPipeline:
-    def test_single_command(self):
-        assert split_pipeline(["ls", "-la"]) == [["ls", "-la"]]
-
-    def test_two_commands(self):
-        assert split_pipeline(["ls", "|", "grep", "foo"]) == [
-            ["ls"],
-            ["grep", "foo"],
-        ]
+    @pytest.mark.parametrize(
+        ("tokens", "expected"),
+        [
+            (["ls", "-la"], [["ls", "-la"]]),
+            (["echo"], [["echo"]]),
+            (["ls", "|", "grep", "foo"], [["ls"], ["grep", "foo"]]),
+            (["a", "|", "b", "|", "c"], [["a"], ["b"], ["c"]]),
+            (
+                ["ls", "-la", "|", "grep", "-i", "foo", "|", "wc", "-l"],
+                [["ls", "-la"], ["grep", "-i", "foo"], ["wc", "-l"]],
+            ),
+        ],
+    )
+    def test_split(self, tokens, expected):
+        assert split_pipeline(tokens) == expected
 
-    def test_three_commands(self):
-        result = split_pipeline(["a", "|", "b", "|", "c"])
-        assert result == [["a"], ["b"], ["c"]]
-
-    def test_pipe_with_args(self):
-        result = split_pipeline(["ls", "-la", "|", "grep", "-i", "foo", "|", "wc", "-l"])
-        assert result == [["ls", "-la"], ["grep", "-i", "foo"], ["wc", "-l"]]
-
-    def test_leading_pipe_error(self):
+    @pytest.mark.parametrize(
+        "tokens",
+        [["|", "cmd"], ["cmd", "|"], ["cmd1", "|", "|", "cmd2"]],
+        ids=["leading", "trailing", "double"],
+    )
+    def test_misplaced_pipe_error(self, tokens):
         with pytest.raises(ValueError, match="syntax error"):
-            split_pipeline(["|", "cmd"])
+            split_pipeline(tokens)
 
-    def test_trailing_pipe_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            split_pipeline(["cmd", "|"])
 
-    def test_double_pipe_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            split_pipeline(["cmd1", "|", "|", "cmd2"])
+class TestParseRedirections:
+    @pytest.mark.parametrize(
+        ("tokens", "expected"),
+        [
+            (["echo", "hello"], Command(argv=["echo", "hello"])),
+            (
+                ["echo", "hello", ">", "out.txt"],
+                Command(argv=["echo", "hello"], stdout_file="out.txt"),
+            ),
+            (
+                ["echo", "hello", ">>", "out.txt"],
+                Command(argv=["echo", "hello"], stdout_file="out.txt", stdout_append=True),
+            ),
+            (["cat", "<", "in.txt"], Command(argv=["cat"], stdin_file="in.txt")),
+            (
+                ["sort", "<", "in.txt", ">", "out.txt"],
+                Command(argv=["sort"], stdin_file="in.txt", stdout_file="out.txt"),
+            ),
+            (
+                [">", "out.txt", "echo", "hello"],
+                Command(argv=["echo", "hello"], stdout_file="out.txt"),
+            ),
+            # The last redirect wins, including its append mode
+            (
+                ["echo", ">", "first.txt", ">", "second.txt"],
+                Command(argv=["echo"], stdout_file="second.txt"),
+            ),
+            (
+                ["echo", ">>", "a.txt", ">", "b.txt"],
+                Command(argv=["echo"], stdout_file="b.txt"),
+            ),
+            (
+                ["echo", ">", "a.txt", ">>", "b.txt"],
+                Command(argv=["echo"], stdout_file="b.txt", stdout_append=True),
+            ),
+        ],
+    )
+    def test_parse(self, tokens, expected):
+        assert parse_redirections(tokens) == expected
 
-    def test_single_word(self):
-        assert split_pipeline(["echo"]) == [["echo"]]
+    @pytest.mark.parametrize(
+        ("tokens", "message"),
+        [
+            (["echo", ">"], "syntax error"),
+            (["cat", "<"], "syntax error"),
+            (["echo", ">>"], "syntax error"),
+            ([">", "file"], "missing command"),
+        ],
+    )
+    def test_errors(self, tokens, message):
+        with pytest.raises(ValueError, match=message):
+            parse_redirections(tokens)
 
 
-class TestParseRedirections:
-    def test_no_redirections(self):
-        cmd = parse_redirections(["echo", "hello"])
-        assert cmd.argv == ["echo", "hello"]
-        assert cmd.stdin_file is None
-        assert cmd.stdout_file is None
-        assert cmd.stdout_append is False
+class TestParseLine:
+    def test_single_command(self):
+        assert parse_line(["echo", "hello"]) == [(None, [Command(argv=["echo", "hello"])])]
 
-    def test_stdout_redirect(self):
-        cmd = parse_redirections(["echo", "hello", ">", "out.txt"])
-        assert cmd.argv == ["echo", "hello"]
-        assert cmd.stdout_file == "out.txt"
-        assert cmd.stdout_append is False
+    def test_and_operator(self):
+        result = parse_line(["cmd1", "&&", "cmd2"])
+        assert result == [(None, [Command(argv=["cmd1"])]), ("&&", [Command(argv=["cmd2"])])]
 
-    def test_stdout_append(self):
-        cmd = parse_redirections(["echo", "hello", ">>", "out.txt"])
-        assert cmd.argv == ["echo", "hello"]
-        assert cmd.stdout_file == "out.txt"
-        assert cmd.stdout_append is True
+    def test_or_operator(self):
+        result = parse_line(["cmd1", "||", "cmd2"])
+        assert result == [(None, [Command(argv=["cmd1"])]), ("||", [Command(argv=["cmd2"])])]
 
-    def test_stdin_redirect(self):
-        cmd = parse_redirections(["cat", "<", "in.txt"])
-        assert cmd.argv == ["cat"]
-        assert cmd.stdin_file == "in.txt"
+    def test_chain_of_operators(self):
+        result = parse_line(["a", "&&", "b", "||", "c", "&&", "d"])
+        assert [op for op, _ in result] == [None, "&&", "||", "&&"]
+        assert [p[0].argv for _, p in result] == [["a"], ["b"], ["c"], ["d"]]
 
-    def test_both_redirections(self):
-        cmd = parse_redirections(["sort", "<", "in.txt", ">", "out.txt"])
-        assert cmd.argv == ["sort"]
-        assert cmd.stdin_file == "in.txt"
-        assert cmd.stdout_file == "out.txt"
+    def test_preserves_args(self):
+        result = parse_line(["cmd1", "-a", "&&", "cmd2", "-b", "-c"])
+        assert result == [
+            (None, [Command(argv=["cmd1", "-a"])]),
+            ("&&", [Command(argv=["cmd2", "-b", "-c"])]),
+        ]
 
-    def test_redirect_before_args(self):
-        cmd = parse_redirections([">", "out.txt", "echo", "hello"])
-        assert cmd.argv == ["echo", "hello"]
-        assert cmd.stdout_file == "out.txt"
+    def test_pipes_and_redirections(self):
+        result = parse_line(["sort", "<", "in.txt", "|", "uniq", ">>", "out.txt", "&&", "ls"])
+        assert result == [
+            (
+                None,
+                [
+                    Command(argv=["sort"], stdin_file="in.txt"),
+                    Command(argv=["uniq"], stdout_file="out.txt", stdout_append=True),
+                ],
+            ),
+            ("&&", [Command(argv=["ls"])]),
+        ]
 
-    def test_missing_stdout_filename(self):
+    def test_leading_and_error(self):
         with pytest.raises(ValueError, match="syntax error"):
-            parse_redirections(["echo", ">"])
+            parse_line(["&&", "cmd"])
 
-    def test_missing_stdin_filename(self):
+    def test_trailing_and_error(self):
         with pytest.raises(ValueError, match="syntax error"):
-            parse_redirections(["cat", "<"])
+            parse_line(["cmd", "&&"])
 
-    def test_missing_append_filename(self):
+    def test_trailing_or_error(self):
         with pytest.raises(ValueError, match="syntax error"):
-            parse_redirections(["echo", ">>"])
+            parse_line(["cmd", "||"])
 
-    def test_only_redirect_no_command(self):
-        with pytest.raises(ValueError, match="missing command"):
-            parse_redirections([">", "file"])
+    def test_double_operator_error(self):
+        with pytest.raises(ValueError, match="syntax error"):
+            parse_line(["cmd1", "&&", "&&", "cmd2"])
 
-    def test_last_redirect_wins(self):
-        cmd = parse_redirections(["echo", ">", "first.txt", ">", "second.txt"])
-        assert cmd.stdout_file == "second.txt"
-        assert cmd.stdout_append is False
+    def test_trailing_pipe_error(self):
+        with pytest.raises(ValueError, match="unexpected token `\\|'"):
+            parse_line(["cmd", "|"])
 
-    def test_append_then_overwrite(self):
-        cmd = parse_redirections(["echo", ">>", "a.txt", ">", "b.txt"])
-        assert cmd.stdout_file == "b.txt"
-        assert cmd.stdout_append is False
+    def test_pipe_before_and_error(self):
+        with pytest.raises(ValueError, match="syntax error"):
+            parse_line(["cmd", "|", "&&", "cmd2"])
 
-    def test_overwrite_then_append(self):
-        cmd = parse_redirections(["echo", ">", "a.txt", ">>", "b.txt"])
-        assert cmd.stdout_file == "b.txt"
-        assert cmd.stdout_append is True
+    def test_missing_redirect_target(self):
+        with pytest.raises(ValueError, match="newline"):
+            parse_line(["echo", ">"])
+
+    def test_operator_as_redirect_target(self):
+        with pytest.raises(ValueError, match="unexpected token `\\|'"):
+            parse_line(["echo", ">", "|", "cat"])
+
+    def test_redirect_without_command(self):
+        with pytest.raises(ValueError, match="missing command"):
+            parse_line([">", "file", "&&", "ls"])
 
 
 class TestCommandDataclass:
@@ -130,3 +192,76 @@ class TestCommandDataclass:
         a = Command(argv=["ls"], stdout_file="f.txt")
         b = Command(argv=["ls"], stdout_file="f.txt")
         assert a == b
+
+    def test_slots_reject_unknown_attributes(self):
+        cmd = Command(argv=["ls"])
+        assert not hasattr(cmd, "__dict__")
+        with pytest.raises(AttributeError):
+            cmd.stdout_fiel = "typo.txt"
+
+
+class TestExecutePipeline:
+    def test_single_exit_code(self):
+        assert execute_pipeline([Command(argv=["true"])]) == 0
+        assert execute_pipeline([Command(argv=["false"])]) != 0
+
+    def test_single_redirect(self, tmp_path):
+        outfile = tmp_path / "out.txt"
+        cmd = Command(argv=["echo", "hello"], stdout_file=str(outfile))
+        assert execute_pipeline([cmd]) == 0
+        assert outfile.read_text() == "hello\n"
+
+    def test_multi_stage(self, tmp_path):
+        infile = tmp_path / "in.txt"
+        infile.write_text("b\na\nc\n")
+        outfile = tmp_path / "out.txt"
+        commands = [
+            Command(argv=["sort"], stdin_file=str(infile)),
+            Command(argv=["head", "-2"]),
+            Command(argv=["tr", "a-z", "A-Z"], stdout_file=str(outfile)),
+        ]
+        assert execute_pipeline(commands) == 0
+        assert outfile.read_text() == "A\nB\n"
+
+    def test_multi_last_exit_code(self):
+        assert execute_pipeline([Command(argv=["true"]), Command(argv=["false"])]) != 0
+
+    @pytest.mark.parametrize("depth", [2, 8, 32])
+    def test_pipe_depth(self, tmp_path, depth):
+        outfile = tmp_path / "out.txt"
+        commands = [Command(argv=["echo", "x"])]
+        commands += [Command(argv=["cat"]) for _ in range(depth - 1)]
+        commands[-1].stdout_file = str(outfile)
+        fds_before = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+        assert execute_pipeline(commands) == 0
+        assert outfile.read_text() == "x\n"
+        if fds_before is not None:
+            # Every pipe end is closed in the parent once the pipeline finishes
+            assert len(os.listdir("/proc/self/fd")) == fds_before
+
+    def test_command_not_found(self, capsys):
+        assert execute_pipeline([Command(argv=["nonexistent_cmd_xyz"])]) == 127
+        assert "command not found" in capsys.readouterr().err
+
+    def test_command_not_found_in_pipeline(self, capsys):
+        commands = [Command(argv=["echo", "hi"]), Command(argv=["nonexistent_cmd_xyz"])]
+        assert execute_pipeline(commands) == 127
+        assert "command not found" in capsys.readouterr().err
+
+
+class TestExecuteCommand:
+    def test_exit_code(self):
+        assert execute_command(Command(argv=["true"])) == 0
+        assert execute_command(Command(argv=["false"])) != 0
+
+    def test_redirects(self, tmp_path):
+        infile = tmp_path / "in.txt"
+        infile.write_text("hello\n")
+        outfile = tmp_path / "out.txt"
+        cmd = Command(argv=["cat"], stdin_file=str(infile), stdout_file=str(outfile))
+        assert execute_command(cmd) == 0
+        assert outfile.read_text() == "hello\n"
+
+    def test_command_not_found(self, capsys):
+        assert execute_command(Command(argv=["nonexistent_cmd_xyz"])) == 127
+        assert "command not found" in capsys.readouterr().err
@@ -4,7 +4,10 @@ import os
 
 import pytest
 
-from simpleshell.shell import Shell
+from simpleshell import shell as shell_module
+from simpleshell.shell import Shell, _tail_lines
+
+HOME = os.path.expanduser("~")
 
 
 @pytest.fixture
@@ -17,17 +20,23 @@ class TestShellInit:
         assert shell.aliases == {}
         assert shell.last_exit_code == 0
 
+    def test_construction_does_no_history_io(self, monkeypatch):
+        def fail(*args):
+            raise AssertionError("Shell() read history; that is left to run()")
+
+        monkeypatch.setattr(shell_module, "_tail_lines", fail)
+        shell = Shell()
+        assert shell._history_thread is None
+
 
 class TestPrompt:
     def test_prompt_at_home(self, shell, monkeypatch):
-        home = os.path.expanduser("~")
-        monkeypatch.chdir(home)
+        monkeypatch.chdir(HOME)
         assert shell.get_prompt() == "~ $ "
 
     def test_prompt_in_subdir(self, shell, monkeypatch):
-        home = os.path.expanduser("~")
         # Use a directory that exists under home
-        test_dir = os.path.join(home, ".claude")
+        test_dir = os.path.join(HOME, ".claude")
         if os.path.isdir(test_dir):
             monkeypatch.chdir(test_dir)
             assert shell.get_prompt() == "~/.claude $ "
@@ -39,56 +48,46 @@ class TestPrompt:
         assert prompt.endswith(" $ ")
         assert "~" not in prompt or prompt.startswith("~/")
 
+    def test_prompt_follows_exported_home(self, shell, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", os.environ.get("HOME", "/"))
+        monkeypatch.chdir(tmp_path)
+        shell.run_command(f"export HOME={tmp_path}")
+        assert shell.get_prompt() == "~ $ "
 
-class TestSplitCommandList:
-    def test_single_command(self):
-        result = Shell._split_command_list(["echo", "hello"])
-        assert result == [(None, ["echo", "hello"])]
-
-    def test_and_operator(self):
-        result = Shell._split_command_list(["cmd1", "&&", "cmd2"])
-        assert result == [(None, ["cmd1"]), ("&&", ["cmd2"])]
-
-    def test_or_operator(self):
-        result = Shell._split_command_list(["cmd1", "||", "cmd2"])
-        assert result == [(None, ["cmd1"]), ("||", ["cmd2"])]
-
-    def test_chain_of_operators(self):
-        result = Shell._split_command_list(["a", "&&", "b", "||", "c", "&&", "d"])
-        assert result == [
-            (None, ["a"]),
-            ("&&", ["b"]),
-            ("||", ["c"]),
-            ("&&", ["d"]),
-        ]
-
-    def test_preserves_args(self):
-        result = Shell._split_command_list(["cmd1", "-a", "&&", "cmd2", "-b", "-c"])
-        assert result == [
-            (None, ["cmd1", "-a"]),
-            ("&&", ["cmd2", "-b", "-c"]),
-        ]
+    def test_prompt_follows_changed_home_env(self, shell, tmp_path, monkeypatch):
+        (tmp_path / "sub").mkdir()
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.chdir(tmp_path / "sub")
+        assert shell.get_prompt() == "~/sub $ "
 
-    def test_leading_and_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            Shell._split_command_list(["&&", "cmd"])
+    def test_prompt_tracks_directory_changes(self, shell, tmp_path, monkeypatch):
+        (tmp_path / "sub").mkdir()
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.chdir(tmp_path)
+        assert shell.get_prompt() == "~ $ "
+        assert shell.get_prompt() == "~ $ "
+        shell.run_command("cd sub")
+        assert shell.get_prompt() == "~/sub $ "
+        monkeypatch.setenv("HOME", str(tmp_path / "sub"))
+        assert shell.get_prompt() == "~ $ "
 
-    def test_trailing_and_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            Shell._split_command_list(["cmd", "&&"])
+    def test_prompt_sibling_of_home_not_abbreviated(self, tmp_path, monkeypatch):
+        (tmp_path / "user").mkdir()
+        (tmp_path / "user2").mkdir()
+        monkeypatch.setenv("HOME", str(tmp_path / "user"))
+        monkeypatch.chdir(tmp_path / "user2")
+        assert Shell().get_prompt() == f"{tmp_path / 'user2'} $ "
 
-    def test_trailing_or_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            Shell._split_command_list(["cmd", "||"])
+    def test_prompt_does_not_reread_home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.chdir(tmp_path)
+        shell = Shell()
 
-    def test_double_operator_error(self):
-        with pytest.raises(ValueError, match="syntax error"):
-            Shell._split_command_list(["cmd1", "&&", "&&", "cmd2"])
+        def fail(path):
+            raise AssertionError("home re-read while HOME is unchanged")
 
-    def test_pipe_not_split_here(self):
-        # Pipes should NOT be split by _split_command_list
-        result = Shell._split_command_list(["cmd1", "|", "cmd2"])
-        assert result == [(None, ["cmd1", "|", "cmd2"])]
+        monkeypatch.setattr(os.path, "expanduser", fail)
+        assert shell.get_prompt() == "~ $ "
 
 
 class TestAliasExpansion:
@@ -118,10 +117,40 @@ class TestAliasExpansion:
         result = shell._expand_aliases(["ll"])
         assert result == ["ls", "-la"]
 
+    def test_mutually_recursive_aliases_stop(self, shell):
+        shell.aliases["a"] = "b -x"
+        shell.aliases["b"] = "a -y"
+        assert shell._expand_aliases(["a"]) == ["a", "-y", "-x"]
+
     def test_empty_tokens(self, shell):
         result = shell._expand_aliases([])
         assert result == []
 
+    def test_empty_alias_value(self, shell):
+        shell.aliases["nothing"] = ""
+        assert shell._expand_aliases(["nothing"]) == []
+        assert shell._expand_aliases(["nothing", "ls"]) == ["ls"]
+
+    def test_cached_tokens_not_mutated(self, shell):
+        shell.aliases["ll"] = "ls -la"
+        assert shell._expand_aliases(["ll", "/tmp"]) == ["ls", "-la", "/tmp"]
+        assert shell._expand_aliases(["ll"]) == ["ls", "-la"]
+
+    def test_set_and_unset_alias(self, shell):
+        shell.set_alias("ll", "ls -la")
+        assert shell._expand_aliases(["ll"]) == ["ls", "-la"]
+        shell.set_alias("ll", "ls -l")
+        assert shell._expand_aliases(["ll"]) == ["ls", "-l"]
+        shell.unset_alias("ll")
+        assert shell._expand_aliases(["ll"]) == ["ll"]
+        assert shell._alias_token_cache == {}
+
+    def test_redefined_alias_retokenized(self, shell):
+        shell.aliases["ll"] = "ls -la"
+        assert shell._expand_aliases(["ll"]) == ["ls", "-la"]
+        shell.aliases["ll"] = "ls -l"
+        assert shell._expand_aliases(["ll"]) == ["ls", "-l"]
+
 
 class TestRunCommand:
     def test_builtin_pwd(self, shell, capsys, tmp_path, monkeypatch):
@@ -141,6 +170,23 @@ class TestRunCommand:
         shell.run_command("nonexistent_command_xyz_123")
         assert "command not found" in capsys.readouterr().err
 
+    def test_missing_command_with_redirect_still_creates_file(self, shell, tmp_path):
+        outfile = tmp_path / "out.txt"
+        shell.run_command(f"nonexistent_command_xyz_123 > {outfile}")
+        assert shell.last_exit_code == 127
+        assert outfile.exists()
+
+    def test_command_installed_mid_session_runs(self, shell, tmp_path, monkeypatch):
+        monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+        shell.run_command("my_fake_cmd")
+        assert shell.last_exit_code == 127
+        fake_bin = tmp_path / "my_fake_cmd"
+        fake_bin.write_text("#!/bin/sh\nexit 7\n")
+        fake_bin.chmod(0o755)
+        # No PATH change or rehash needed, as in other shells
+        shell.run_command("my_fake_cmd")
+        assert shell.last_exit_code == 7
+
     def test_exit_code_success(self, shell):
         shell.run_command("true")
         assert shell.last_exit_code == 0
@@ -182,6 +228,11 @@ class TestRunCommand:
         shell.run_command(f"echo hello > {outfile}")
         assert outfile.read_text().strip() == "hello"
 
+    def test_external_output(self, shell, capfd):
+        # Children write to the inherited fd, which capsys cannot see
+        shell.run_command("echo hello")
+        assert capfd.readouterr().out == "hello\n"
+
     def test_var_expansion_to_file(self, shell, tmp_path, monkeypatch):
         monkeypatch.setenv("GREETING", "hello")
         outfile = tmp_path / "out.txt"
@@ -191,3 +242,137 @@ class TestRunCommand:
     def test_syntax_error(self, shell, capsys):
         shell.run_command("echo 'unterminated")
         assert capsys.readouterr().err != ""
+
+    def test_simple_line_alias_with_operators(self, shell, tmp_path):
+        outfile = tmp_path / "out.txt"
+        shell.aliases["w"] = f"echo hi > {outfile}"
+        shell.run_command("w")
+        assert outfile.read_text().strip() == "hi"
+
+    def test_alias_defined_on_same_line_not_expanded(self, shell):
+        # As in bash, aliases are expanded when the whole line is read
+        shell.run_command("alias x_alias_xyz=true && x_alias_xyz")
+        assert shell.last_exit_code == 127
+        shell.run_command("x_alias_xyz")
+        assert shell.last_exit_code == 0
+
+    def test_alias_in_later_segment(self, shell):
+        shell.aliases["ok"] = "true"
+        shell.run_command("false || ok")
+        assert shell.last_exit_code == 0
+
+    def test_parse_error_runs_nothing(self, shell, capsys, tmp_path):
+        outfile = tmp_path / "out.txt"
+        shell.run_command(f"echo hi > {outfile} && echo >")
+        assert "syntax error" in capsys.readouterr().err
+        assert not outfile.exists()
+        assert shell.last_exit_code == 2
+
+    @pytest.mark.parametrize("words", [["echo", "a\vb"], ["echo", "a\xa0b\fc"]])
+    def test_plain_line_split_like_tokenizer(self, shell, monkeypatch, words):
+        # Only ' \t\r\n' separate words, with or without metacharacters
+        seen = []
+        monkeypatch.setattr(shell_module, "parse_line", lambda tokens: seen.append(tokens) or [])
+        shell.run_command(" ".join(words))
+        shell.run_command(" ".join([*words, "|", "cat"]))
+        assert seen == [words, [*words, "|", "cat"]]
+
+    def test_pipeline_helpers_resolved_at_call_time(self, shell, monkeypatch):
+        calls = []
+
+        def fake_execute(commands):
+            calls.append([cmd.argv for cmd in commands])
+            return 3
+
+        monkeypatch.setattr(shell_module, "execute_pipeline", fake_execute)
+        shell.run_command("ls | wc -l")
+        assert calls == [[["ls"], ["wc", "-l"]]]
+        assert shell.last_exit_code == 3
+
+    def test_builtin_registered_at_runtime_dispatches(self, shell, monkeypatch):
+        calls = []
+
+        def builtin_greeting(args, shell):
+            calls.append(args)
+            return 5
+
+        monkeypatch.setitem(shell_module.BUILTIN_REGISTRY, "a_long_builtin_name", builtin_greeting)
+        shell.run_command("a_long_builtin_name hi")
+        assert calls == [["hi"]]
+        assert shell.last_exit_code == 5
+
+    def test_relative_paths_follow_cd(self, shell, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "a.txt").write_text("from a\n")
+        shell.run_command("cd sub")
+        # Redirections, globs and child processes all see the new directory
+        shell.run_command("cat *.txt > out.log")
+        assert (tmp_path / "sub" / "out.log").read_text() == "from a\n"
+
+
+class TestHistoryFile:
+    def test_tail_lines_short_file(self, tmp_path):
+        path = tmp_path / "hist"
+        path.write_text("a\nb\nc\n")
+        assert _tail_lines(str(path), 10) == ["a", "b", "c"]
+
+    def test_tail_lines_keeps_last_entries(self, tmp_path):
+        path = tmp_path / "hist"
+        path.write_text("".join(f"echo {i}\n" for i in range(5000)))
+        result = _tail_lines(str(path), 1000)
+        assert len(result) == 1000
+        assert result[0] == "echo 4000"
+        assert result[-1] == "echo 4999"
+
+    def test_tail_lines_empty_file(self, tmp_path):
+        path = tmp_path / "hist"
+        path.write_text("")
+        assert _tail_lines(str(path), 10) == []
+
+    def test_writer_appends_lines(self, shell, tmp_path, monkeypatch):
+        path = tmp_path / "hist"
+        path.write_text("old\n")
+        monkeypatch.setattr(shell_module, "HISTORY_FILE", str(path))
+        shell._start_history_writer()
+        shell.record_history("echo one")
+        shell.record_history("echo two")
+        shell._stop_history_writer()
+        assert path.read_text() == "old\necho one\necho two\n"
+
+    def test_record_without_writer_is_noop(self, shell, tmp_path, monkeypatch):
+        path = tmp_path / "hist"
+        monkeypatch.setattr(shell_module, "HISTORY_FILE", str(path))
+        shell.record_history("echo one")
+        assert not path.exists()
+
+    def test_save_history_skipped_when_not_interactive(self, shell, tmp_path, monkeypatch):
+        path = tmp_path / "hist"
+        monkeypatch.setattr(shell_module, "HISTORY_FILE", str(path))
+        shell.save_history()
+        assert not path.exists()
+
+    def test_save_history_trims_to_history_length(self, shell, tmp_path, monkeypatch):
+        readline = pytest.importorskip("readline")
+        path = tmp_path / "hist"
+        path.write_text("".join(f"echo {i}\n" for i in range(5)))
+        monkeypatch.setattr(shell_module, "HISTORY_FILE", str(path))
+        old_length = readline.get_history_length()
+        readline.set_history_length(3)
+        try:
+            shell._interactive = True
+            shell.save_history()
+        finally:
+            readline.set_history_length(old_length)
+        assert path.read_text() == "echo 2\necho 3\necho 4\n"
+
+    def test_sourced_lines_not_recorded(self, shell, tmp_path, monkeypatch):
+        path = tmp_path / "hist"
+        script = tmp_path / "cmds.sh"
+        script.write_text("true\ntrue\n")
+        monkeypatch.setattr(shell_module, "HISTORY_FILE", str(path))
+        shell._start_history_writer()
+        shell.run_command(f"source {script}")
+        shell._stop_history_writer()
+        assert path.read_text() == f"source {script}\n"
+        assert shell._scripted == 0
@@ -1,216 +1,311 @@
-"""System tests — run the shell as a subprocess and verify end-to-end behavior."""
+"""System tests — feed whole sessions to the shell and verify end-to-end behavior.
 
+Most tests run the shell loop in-process with stdin replaced, capturing
+output at the file-descriptor level so child processes are captured too.
+TestSubprocess keeps a few checks against a real `python -m simpleshell`,
+mostly through one shared process (shell_proc).
+"""
+
+import io
 import os
+import select
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
 
-SHELL_CMD = [sys.executable, "-m", "simpleshell"]
+import pytest
 
+from simpleshell.shell import Shell
 
-def run_shell(commands: str, **kwargs) -> subprocess.CompletedProcess:
-    """Run simpleshell with the given commands piped to stdin."""
-    return subprocess.run(
+SHELL_CMD = [sys.executable, "-m", "simpleshell"]
+HOME = os.path.expanduser("~")
+# Seconds to wait for the shared shell to answer one send()
+SEND_TIMEOUT = 10
+
+
+@pytest.fixture(scope="module")
+def scratch_root(tmp_path_factory):
+    """A scratch directory shared by a module's tests, in RAM where possible."""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        path = Path(tempfile.mkdtemp(prefix="simpleshell-", dir="/dev/shm"))
+        yield path
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        yield tmp_path_factory.mktemp("scratch")
+
+
+@pytest.fixture
+def scratch(scratch_root):
+    """A fresh directory for one test, under scratch_root."""
+    return Path(tempfile.mkdtemp(dir=scratch_root))
+
+
+@pytest.fixture
+def run_shell(capfd, monkeypatch):
+    """Return a function that runs a session in-process and captures its output."""
+    # Sessions cd and export; put the cwd and environment back afterwards
+    monkeypatch.chdir(os.getcwd())
+    saved_environ = dict(os.environ)
+
+    def run(commands: str) -> SimpleNamespace:
+        monkeypatch.setattr(sys, "stdin", io.StringIO(commands))
+        capfd.readouterr()
+        try:
+            Shell().run()
+            returncode = 0
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+        out, err = capfd.readouterr()
+        return SimpleNamespace(stdout=out, stderr=err, returncode=returncode)
+
+    yield run
+    os.environ.clear()
+    os.environ.update(saved_environ)
+
+
+@pytest.fixture(scope="module")
+def shell_proc():
+    """One long-lived simpleshell subprocess shared by a module's tests.
+
+    stderr is merged into stdout so a single stream can be read up to a
+    sentinel; see send().
+    """
+    proc = subprocess.Popen(
         SHELL_CMD,
-        input=commands,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    yield proc
+    proc.stdin.close()
+    proc.wait(timeout=10)
+    proc.stdout.close()
+
+
+def send(proc: subprocess.Popen, commands: str) -> str:
+    """Send commands to a running shell and return its output up to a sentinel.
+
+    The shell flushes stdout before each prompt, so everything the commands
+    printed arrives before the sentinel echoed after them. Fails the test if
+    the sentinel does not arrive within SEND_TIMEOUT seconds.
+    """
+    sentinel = f"__DONE_{uuid.uuid4().hex}__".encode()
+    proc.stdin.write(f"{commands}echo ".encode() + sentinel + b"\n")
+    proc.stdin.flush()
+    fd = proc.stdout.fileno()
+    deadline = time.monotonic() + SEND_TIMEOUT
+    data = b""
+    while sentinel not in data:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            pytest.fail(f"shell did not answer within {SEND_TIMEOUT}s; got {data!r}")
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            pytest.fail(f"shell exited before answering; got {data!r}")
+        data += chunk
+    # Drop the line carrying the sentinel, like the lines after it
+    output = data[: data.rfind(b"\n", 0, data.index(sentinel)) + 1]
+    return output.decode(errors="replace")
+
+
+def run_shell_subprocess(commands: str, **kwargs) -> subprocess.CompletedProcess:
+    """Run simpleshell as a subprocess with the given commands piped to stdin.
+
+    Output is captured as bytes and decoded once, rather than through a
+    text wrapper.
+    """
+    result = subprocess.run(
+        SHELL_CMD,
+        input=commands.encode(),
         capture_output=True,
-        text=True,
         timeout=10,
         **kwargs,
     )
+    result.stdout = result.stdout.decode(errors="replace")
+    result.stderr = result.stderr.decode(errors="replace")
+    return result
 
 
 class TestBasicExecution:
-    def test_echo(self):
+    def test_echo(self, run_shell):
         result = run_shell("echo hello world\nexit\n")
         assert "hello world" in result.stdout
 
-    def test_exit_code_zero(self):
+    def test_exit_code_zero(self, run_shell):
         result = run_shell("exit\n")
         assert result.returncode == 0
 
-    def test_exit_code_custom(self):
+    def test_exit_code_custom(self, run_shell):
         result = run_shell("exit 42\n")
         assert result.returncode == 42
 
-    def test_multiple_commands(self):
+    def test_multiple_commands(self, run_shell):
         result = run_shell("echo first\necho second\nexit\n")
         assert "first" in result.stdout
         assert "second" in result.stdout
 
-    def test_command_not_found(self):
+    def test_command_not_found(self, run_shell):
         result = run_shell("nonexistent_command_xyz\nexit\n")
         assert "command not found" in result.stderr
 
-    def test_empty_lines_ignored(self):
+    def test_empty_lines_ignored(self, run_shell):
         result = run_shell("\n\n\necho ok\n\nexit\n")
         assert "ok" in result.stdout
 
 
 class TestPipes:
-    def test_simple_pipe(self):
+    def test_simple_pipe(self, run_shell):
         result = run_shell("echo hello world | tr a-z A-Z\nexit\n")
         assert "HELLO WORLD" in result.stdout
 
-    def test_multi_pipe(self):
+    def test_multi_pipe(self, run_shell):
         result = run_shell("echo 'aaa\\nbbb\\nccc' | sort | head -1\nexit\n")
         # Should get sorted output
         assert result.returncode == 0
 
-    def test_pipe_grep(self):
+    def test_pipe_grep(self, run_shell):
         result = run_shell("echo hello | grep hello\nexit\n")
         assert "hello" in result.stdout
 
-    def test_pipe_grep_no_match(self):
+    def test_pipe_grep_no_match(self, run_shell):
         result = run_shell("echo hello | grep goodbye\nexit\n")
         assert "goodbye" not in result.stdout
 
-    def test_pipe_wc(self):
+    def test_closed_pipe_ends_producer_quietly(self, run_shell):
+        # The producer must die of SIGPIPE, not report EPIPE on stderr
+        result = run_shell("yes | head -1\necho done\nexit\n")
+        assert "$ y\n" in result.stdout
+        assert "done" in result.stdout
+        assert result.stderr == ""
+
+    def test_pipe_wc(self, run_shell):
         result = run_shell("echo hello | wc -c\nexit\n")
         # wc -c of "hello\n" is 6; look for a digit in the output
         assert any(c.isdigit() for c in result.stdout)
 
 
 class TestRedirections:
-    def test_stdout_redirect(self, tmp_path):
-        outfile = tmp_path / "out.txt"
+    def test_stdout_redirect(self, run_shell, scratch):
+        outfile = scratch / "out.txt"
         run_shell(f"echo hello > {outfile}\nexit\n")
         assert outfile.read_text().strip() == "hello"
 
-    def test_stdout_append(self, tmp_path):
-        outfile = tmp_path / "out.txt"
+    def test_stdout_append(self, run_shell, scratch):
+        outfile = scratch / "out.txt"
         run_shell(f"echo line1 > {outfile}\necho line2 >> {outfile}\nexit\n")
         content = outfile.read_text()
         assert "line1" in content
         assert "line2" in content
 
-    def test_stdin_redirect(self, tmp_path):
-        infile = tmp_path / "in.txt"
+    def test_stdin_redirect(self, run_shell, scratch):
+        infile = scratch / "in.txt"
         infile.write_text("hello from file\n")
         result = run_shell(f"cat < {infile}\nexit\n")
         assert "hello from file" in result.stdout
 
-    def test_redirect_overwrite(self, tmp_path):
-        outfile = tmp_path / "out.txt"
+    def test_redirect_overwrite(self, run_shell, scratch):
+        outfile = scratch / "out.txt"
         run_shell(f"echo first > {outfile}\necho second > {outfile}\nexit\n")
         assert outfile.read_text().strip() == "second"
 
-    def test_redirect_nonexistent_input(self, tmp_path):
-        result = run_shell(f"cat < {tmp_path}/nonexistent.txt\nexit\n")
+    def test_redirect_nonexistent_input(self, run_shell, scratch):
+        result = run_shell(f"cat < {scratch}/nonexistent.txt\nexit\n")
         assert "No such file" in result.stderr
 
-    def test_pipe_with_redirect(self, tmp_path):
-        outfile = tmp_path / "out.txt"
+    def test_pipe_with_redirect(self, run_shell, scratch):
+        outfile = scratch / "out.txt"
         run_shell(f"echo hello world | tr a-z A-Z > {outfile}\nexit\n")
         assert outfile.read_text().strip() == "HELLO WORLD"
 
 
 class TestBuiltinRedirection:
-    def test_help_redirect(self, tmp_path):
-        outfile = tmp_path / "help.txt"
+    def test_help_redirect(self, run_shell, scratch):
+        outfile = scratch / "help.txt"
         run_shell(f"help > {outfile}\nexit\n")
         content = outfile.read_text()
         assert "built-in commands" in content
 
-    def test_pwd_redirect(self, tmp_path):
-        outfile = tmp_path / "pwd.txt"
+    def test_pwd_redirect(self, run_shell, scratch):
+        outfile = scratch / "pwd.txt"
         run_shell(f"pwd > {outfile}\nexit\n")
         content = outfile.read_text().strip()
         assert len(content) > 0
 
-    def test_env_redirect(self, tmp_path):
-        outfile = tmp_path / "env.txt"
+    def test_env_redirect(self, run_shell, scratch):
+        outfile = scratch / "env.txt"
         run_shell(f"env > {outfile}\nexit\n")
         content = outfile.read_text()
         assert "PATH=" in content
 
 
 class TestVariableExpansion:
-    def test_home_expansion(self):
+    def test_home_expansion(self, run_shell):
         result = run_shell("echo $HOME\nexit\n")
-        home = os.path.expanduser("~")
-        assert home in result.stdout
+        assert HOME in result.stdout
 
-    def test_braced_var(self):
+    def test_braced_var(self, run_shell):
         result = run_shell("echo ${HOME}\nexit\n")
-        home = os.path.expanduser("~")
-        assert home in result.stdout
+        assert HOME in result.stdout
 
-    def test_undefined_var(self):
+    def test_undefined_var(self, run_shell):
         result = run_shell("echo $UNDEFINED_VAR_XYZ_123\nexit\n")
         # Undefined var expands to empty, so echo prints a blank line.
         # The value "UNDEFINED_VAR_XYZ_123" should NOT appear literally.
         assert "UNDEFINED_VAR_XYZ_123" not in result.stdout
 
-    def test_single_quotes_no_expand(self):
+    def test_single_quotes_no_expand(self, run_shell):
         result = run_shell("echo '$HOME'\nexit\n")
         assert "$HOME" in result.stdout
 
-    def test_double_quotes_expand(self):
+    def test_double_quotes_expand(self, run_shell):
         result = run_shell('echo "$HOME"\nexit\n')
-        home = os.path.expanduser("~")
-        assert home in result.stdout
+        assert HOME in result.stdout
 
 
 class TestAndOr:
-    def test_and_success(self):
-        result = run_shell("echo a && echo b\nexit\n")
-        assert "a" in result.stdout
-        assert "b" in result.stdout
-
-    def test_and_failure(self):
-        result = run_shell("false && echo skipped\nexit\n")
-        assert "skipped" not in result.stdout
-
-    def test_or_failure(self):
-        result = run_shell("false || echo fallback\nexit\n")
-        assert "fallback" in result.stdout
-
-    def test_or_success(self):
-        result = run_shell("true || echo skipped\nexit\n")
-        assert "skipped" not in result.stdout
-
-    def test_chain_and_or(self):
-        result = run_shell("true && echo yes || echo no\nexit\n")
-        assert "yes" in result.stdout
-        assert "no" not in result.stdout
-
-    def test_chain_failure_recovery(self):
-        result = run_shell("false && echo no || echo recovered\nexit\n")
-        assert "no" not in result.stdout
-        assert "recovered" in result.stdout
-
-    def test_three_ands(self):
-        result = run_shell("echo a && echo b && echo c\nexit\n")
-        assert "a" in result.stdout
-        assert "b" in result.stdout
-        assert "c" in result.stdout
-
-    def test_and_stops_at_failure(self):
-        result = run_shell("echo a && false && echo c\nexit\n")
-        assert "a" in result.stdout
-        assert "c" not in result.stdout
-
-    def test_pipe_with_and(self):
-        result = run_shell("echo hello | tr a-z A-Z && echo done\nexit\n")
-        assert "HELLO" in result.stdout
-        assert "done" in result.stdout
+    # Output is compared word by word: the prompt shows the cwd, which may
+    # contain any of these letters.
+    @pytest.mark.parametrize(
+        ("line", "printed", "skipped"),
+        [
+            ("echo a && echo b", ["a", "b"], []),
+            ("false && echo skipped", [], ["skipped"]),
+            ("false || echo fallback", ["fallback"], []),
+            ("true || echo skipped", [], ["skipped"]),
+            ("true && echo yes || echo no", ["yes"], ["no"]),
+            ("false && echo no || echo recovered", ["recovered"], ["no"]),
+            ("echo a && echo b && echo c", ["a", "b", "c"], []),
+            ("echo a && false && echo c", ["a"], ["c"]),
+            ("echo hello | tr a-z A-Z && echo done", ["HELLO", "done"], []),
+        ],
+    )
+    def test_conditional_execution(self, run_shell, line, printed, skipped):
+        words = run_shell(f"{line}\nexit\n").stdout.split()
+        for word in printed:
+            assert word in words
+        for word in skipped:
+            assert word not in words
 
 
 class TestBuiltins:
-    def test_cd_and_pwd(self, tmp_path):
-        result = run_shell(f"cd {tmp_path}\npwd\nexit\n")
-        assert str(tmp_path) in result.stdout
+    def test_cd_and_pwd(self, run_shell, scratch):
+        result = run_shell(f"cd {scratch}\npwd\nexit\n")
+        assert str(scratch) in result.stdout
 
-    def test_cd_home(self):
+    def test_cd_home(self, run_shell):
         result = run_shell("cd\npwd\nexit\n")
-        home = os.path.expanduser("~")
-        assert home in result.stdout
+        assert HOME in result.stdout
 
-    def test_export_and_echo(self):
+    def test_export_and_echo(self, run_shell):
         result = run_shell("export MY_TEST_VAR=hello123\necho $MY_TEST_VAR\nexit\n")
         assert "hello123" in result.stdout
 
-    def test_export_and_unset(self):
+    def test_export_and_unset(self, run_shell):
         result = run_shell(
             "export MY_TEST_VAR=hello\nunset MY_TEST_VAR\necho $MY_TEST_VAR\nexit\n"
         )
@@ -220,96 +315,124 @@ class TestBuiltins:
         echo_lines = [ln for ln in lines if "hello" in ln and "$ " not in ln]
         assert len(echo_lines) == 0
 
-    def test_alias_and_use(self):
+    def test_alias_and_use(self, run_shell):
         result = run_shell("alias hi='echo hello'\nhi\nexit\n")
         assert "hello" in result.stdout
 
-    def test_unalias(self):
+    def test_unalias(self, run_shell):
         result = run_shell("alias hi='echo hello'\nunalias hi\nhi\nexit\n")
         assert "command not found" in result.stderr
 
-    def test_which(self):
+    def test_which(self, run_shell):
         result = run_shell("which sh\nexit\n")
         assert "/sh" in result.stdout or "sh" in result.stdout
 
-    def test_type_builtin(self):
+    def test_type_builtin(self, run_shell):
         result = run_shell("type cd\nexit\n")
         assert "shell builtin" in result.stdout
 
-    def test_type_external(self):
+    def test_type_external(self, run_shell):
         result = run_shell("type sh\nexit\n")
         assert "sh is" in result.stdout
 
-    def test_history(self):
+    def test_history(self, run_shell):
         # When stdin is a pipe, readline may not record history entries.
         # Just verify the history builtin runs without error.
         result = run_shell("history\nexit\n")
         assert result.returncode == 0
 
-    def test_help(self):
+    def test_help(self, run_shell):
         result = run_shell("help\nexit\n")
         assert "built-in commands" in result.stdout
         assert "cd" in result.stdout
         assert "exit" in result.stdout
 
-    def test_source(self, tmp_path):
-        script = tmp_path / "test.sh"
+    def test_source(self, run_shell, scratch):
+        script = scratch / "test.sh"
         script.write_text("echo sourced_ok\n")
         result = run_shell(f"source {script}\nexit\n")
         assert "sourced_ok" in result.stdout
 
-    def test_source_sets_variable(self, tmp_path):
-        script = tmp_path / "setvar.sh"
+    def test_source_sets_variable(self, run_shell, scratch):
+        script = scratch / "setvar.sh"
         script.write_text("export SOURCED_VAR=works\n")
         result = run_shell(f"source {script}\necho $SOURCED_VAR\nexit\n")
         assert "works" in result.stdout
 
 
-class TestGlobbing:
-    def test_star_glob(self, tmp_path):
-        (tmp_path / "a.py").touch()
-        (tmp_path / "b.py").touch()
-        (tmp_path / "c.txt").touch()
-        result = run_shell(f"cd {tmp_path}\necho *.py\nexit\n")
-        assert "a.py" in result.stdout
-        assert "b.py" in result.stdout
-        assert "c.txt" not in result.stdout
+@pytest.fixture(scope="module")
+def glob_dir(scratch_root):
+    """A directory of files shared by the glob tests; they only read it."""
+    path = scratch_root / "glob"
+    path.mkdir()
+    for name in ("a.py", "b.py", "c.txt", "d.md"):
+        (path / name).touch()
+    return path
 
-    def test_no_match_literal(self, tmp_path):
-        result = run_shell(f"cd {tmp_path}\necho *.nonexistent\nexit\n")
-        assert "*.nonexistent" in result.stdout
+
+class TestGlobbing:
+    @pytest.mark.parametrize(
+        ("pattern", "expected"),
+        [
+            ("*.py", ["a.py", "b.py"]),
+            ("?.txt", ["c.txt"]),
+            ("[cd].*", ["c.txt", "d.md"]),
+            ("*.nonexistent", ["*.nonexistent"]),
+        ],
+    )
+    def test_glob(self, run_shell, glob_dir, pattern, expected):
+        result = run_shell(f"cd {glob_dir}\necho {pattern}\nexit\n")
+        assert f"$ {' '.join(expected)}\n" in result.stdout
 
 
 class TestTildeExpansion:
-    def test_tilde_in_echo(self):
+    def test_tilde_in_echo(self, run_shell):
         result = run_shell("echo ~\nexit\n")
-        home = os.path.expanduser("~")
-        assert home in result.stdout
+        assert HOME in result.stdout
 
-    def test_tilde_path(self):
+    def test_tilde_path(self, run_shell):
         result = run_shell("echo ~/foobar\nexit\n")
-        home = os.path.expanduser("~")
-        assert f"{home}/foobar" in result.stdout
+        assert f"{HOME}/foobar" in result.stdout
 
 
 class TestEdgeCases:
-    def test_eof_exits_gracefully(self):
+    def test_eof_exits_gracefully(self, run_shell):
         # No exit command, just EOF
         result = run_shell("")
         assert result.returncode == 0
 
-    def test_syntax_error_pipe(self):
+    def test_syntax_error_pipe(self, run_shell):
         result = run_shell("| cmd\nexit\n")
         assert "syntax error" in result.stderr
 
-    def test_syntax_error_trailing_and(self):
+    def test_syntax_error_trailing_and(self, run_shell):
         result = run_shell("cmd &&\nexit\n")
         assert "syntax error" in result.stderr
 
-    def test_syntax_error_trailing_redirect(self):
+    def test_syntax_error_trailing_redirect(self, run_shell):
         result = run_shell("echo >\nexit\n")
         assert "syntax error" in result.stderr
 
-    def test_very_long_pipeline(self):
+    def test_very_long_pipeline(self, run_shell):
         result = run_shell("echo test | cat | cat | cat | cat\nexit\n")
         assert "test" in result.stdout
+
+
+class TestSubprocess:
+    def test_echo(self, shell_proc):
+        assert "hello world" in send(shell_proc, "echo hello world\n")
+
+    def test_state_persists_between_sends(self, shell_proc, scratch):
+        send(shell_proc, f"cd {scratch}\n")
+        assert str(scratch) in send(shell_proc, "pwd\n")
+
+    def test_exit_code_custom(self):
+        result = run_shell_subprocess("exit 42\n")
+        assert result.returncode == 42
+
+    def test_eof_exits_gracefully(self):
+        result = run_shell_subprocess("")
+        assert result.returncode == 0
+
+    def test_syntax_error_reported(self, shell_proc):
+        assert "syntax error" in send(shell_proc, "| cmd\n")
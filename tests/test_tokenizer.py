@@ -2,7 +2,7 @@
 
 import pytest
 
-from simpleshell.tokenizer import tokenize
+from simpleshell.tokenizer import AND, OR, PIPE, REDIRECT_APPEND, REDIRECT_IN, _scan, tokenize
 
 
 class TestBasicTokenization:
@@ -52,44 +52,29 @@ class TestQuoting:
 
 
 class TestOperators:
-    def test_pipe(self):
-        assert tokenize("ls | grep foo") == ["ls", "|", "grep", "foo"]
-
-    def test_redirect_out(self):
-        assert tokenize("echo hello > file.txt") == ["echo", "hello", ">", "file.txt"]
-
-    def test_redirect_append(self):
-        assert tokenize("echo hello >> file.txt") == ["echo", "hello", ">>", "file.txt"]
-
-    def test_redirect_in(self):
-        assert tokenize("cat < file.txt") == ["cat", "<", "file.txt"]
-
-    def test_and_operator(self):
-        assert tokenize("cmd1 && cmd2") == ["cmd1", "&&", "cmd2"]
-
-    def test_or_operator(self):
-        assert tokenize("cmd1 || cmd2") == ["cmd1", "||", "cmd2"]
-
-    def test_pipe_adjacent_to_word(self):
-        assert tokenize("ls|grep foo") == ["ls", "|", "grep", "foo"]
-
-    def test_redirect_adjacent_to_word(self):
-        assert tokenize("echo foo>bar") == ["echo", "foo", ">", "bar"]
-
-    def test_redirect_in_adjacent(self):
-        assert tokenize("cat<file.txt") == ["cat", "<", "file.txt"]
-
-    def test_multiple_pipes(self):
-        assert tokenize("a | b | c") == ["a", "|", "b", "|", "c"]
-
-    def test_combined_operators(self):
-        tokens = tokenize("cmd1 | cmd2 && cmd3 || cmd4")
-        assert tokens == ["cmd1", "|", "cmd2", "&&", "cmd3", "||", "cmd4"]
+    @pytest.mark.parametrize(
+        ("line", "expected"),
+        [
+            ("ls | grep foo", ["ls", "|", "grep", "foo"]),
+            ("echo hello > file.txt", ["echo", "hello", ">", "file.txt"]),
+            ("echo hello >> file.txt", ["echo", "hello", ">>", "file.txt"]),
+            ("cat < file.txt", ["cat", "<", "file.txt"]),
+            ("cmd1 && cmd2", ["cmd1", "&&", "cmd2"]),
+            ("cmd1 || cmd2", ["cmd1", "||", "cmd2"]),
+            ("ls|grep foo", ["ls", "|", "grep", "foo"]),
+            ("echo foo>bar", ["echo", "foo", ">", "bar"]),
+            ("cat<file.txt", ["cat", "<", "file.txt"]),
+            ("a | b | c", ["a", "|", "b", "|", "c"]),
+            ("cmd1 | cmd2 && cmd3 || cmd4", ["cmd1", "|", "cmd2", "&&", "cmd3", "||", "cmd4"]),
+        ],
+    )
+    def test_tokenize(self, line, expected):
+        assert tokenize(line) == expected
 
 
 class TestOperatorMerging:
     def test_spaced_append_merges(self):
-        # Two consecutive > tokens merge into >>
+        # Two adjacent > characters form a single >> token
         assert tokenize("echo hello >> file") == ["echo", "hello", ">>", "file"]
 
     def test_and_merges(self):
@@ -101,6 +86,25 @@ class TestOperatorMerging:
     def test_single_pipe_stays(self):
         assert tokenize("a | b") == ["a", "|", "b"]
 
+    def test_unspaced_operators_merge_in_one_pass(self):
+        assert tokenize("a>>b||c&&d|e") == ["a", ">>", "b", "||", "c", "&&", "d", "|", "e"]
+
+    def test_triple_operator(self):
+        assert tokenize("a|||b") == ["a", "||", "|", "b"]
+
+    @pytest.mark.parametrize("line", ["a > > b", "'a' > > b"])
+    def test_separated_chars_stay_apart(self, line):
+        # Merging happens while scanning, so only adjacent characters combine
+        assert tokenize(line) == ["a", ">", ">", "b"]
+
+    def test_operators_are_canonical_objects(self):
+        tokens = tokenize("a | b && c || d >> e < f")
+        assert tokens[1] is PIPE
+        assert tokens[3] is AND
+        assert tokens[5] is OR
+        assert tokens[7] is REDIRECT_APPEND
+        assert tokens[9] is REDIRECT_IN
+
 
 class TestSpecialCharactersInWords:
     def test_glob_star(self):
@@ -130,6 +134,37 @@ class TestSpecialCharactersInWords:
     def test_at_sign(self):
         assert tokenize("echo user@host") == ["echo", "user@host"]
 
+    def test_bracket_glob(self):
+        assert tokenize("ls [ab].txt") == ["ls", "[ab].txt"]
+
+    def test_non_ascii_word(self):
+        assert tokenize("echo héllo 日本") == ["echo", "héllo", "日本"]
+
+    def test_hash_inside_word(self):
+        assert tokenize("echo a#b") == ["echo", "a#b"]
+
+    def test_comment_at_word_start(self):
+        assert tokenize("echo hi # a comment") == ["echo", "hi"]
+
+
+class TestEscapes:
+    def test_escaped_quote_in_double_quotes(self):
+        assert tokenize(r'echo "a\"b"') == ["echo", 'a"b']
+
+    def test_backslash_kept_in_double_quotes(self):
+        assert tokenize(r'echo "a\nb"') == ["echo", r"a\nb"]
+
+    def test_backslash_literal_in_single_quotes(self):
+        assert tokenize(r"echo 'a\b'") == ["echo", r"a\b"]
+
+    def test_escaped_operator(self):
+        assert tokenize(r"echo a\|b") == ["echo", "a|b"]
+
+    def test_long_mixed_word(self):
+        # Plain, quoted and escaped runs are sliced and joined once per word
+        line = "x" + 'ab\'cd\'"e\\"f"\\g' * 5000
+        assert _scan(line) == ("x" + 'abcde"fg' * 5000,)
+
 
 class TestErrorHandling:
     def test_unmatched_single_quote(self):
@@ -139,3 +174,66 @@ class TestErrorHandling:
     def test_unmatched_double_quote(self):
         with pytest.raises(ValueError):
             tokenize('echo "unterminated')
+
+    def test_trailing_backslash(self):
+        with pytest.raises(ValueError):
+            tokenize("echo foo\\")
+
+    @pytest.mark.parametrize(
+        ("line", "message"),
+        [
+            ("echo 'abc", "No closing quotation"),
+            ('echo "abc', "No closing quotation"),
+            ('echo "abc\\', "No closing quotation"),
+            ('echo "abc\\"', "No closing quotation"),
+            ("echo abc\\", "No escaped character"),
+        ],
+    )
+    def test_error_messages(self, line, message):
+        with pytest.raises(ValueError, match=message):
+            tokenize(line)
+
+    @pytest.mark.parametrize("line", ["echo hi # it's", "echo hi #\\", 'echo "x" # say "hi'])
+    def test_quotes_in_comments_are_not_errors(self, line):
+        # Balance is only checked where quoting applies, never over the raw line
+        assert tokenize(line)[0] == "echo"
+
+
+class TestCaching:
+    def test_repeated_calls_return_fresh_lists(self):
+        first = tokenize("echo hello")
+        first.append("mutated")
+        assert tokenize("echo hello") == ["echo", "hello"]
+
+    def test_errors_raised_every_time(self):
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                tokenize("echo 'unterminated")
+
+
+class TestPlainLineFastPath:
+    @pytest.mark.parametrize(
+        "line",
+        [
+            "",
+            "   ",
+            "ls -la",
+            "ls|grep foo>out.txt",
+            "a>>b||c&&d|e",
+            "a|||b",
+            "cmd & other",
+            "echo $HOME ${PATH} *.py [ab]?",
+            "\tcat < in.txt\r\n",
+            "echo café ünïcode",
+        ],
+    )
+    def test_matches_full_scanner(self, line):
+        assert tokenize(line) == list(_scan(line))
+
+    def test_operators_are_canonical_objects(self):
+        tokens = tokenize("a|b&&c||d>>e<f")
+        assert tokens[1] is PIPE
+        assert tokens[3] is AND
+        assert tokens[5] is OR
+        assert tokens[7] is REDIRECT_APPEND
+        assert tokens[9] is REDIRECT_IN